@@ -1,17 +1,21 @@
 __author__ = 'jordon'
 
+import os
 import sys
 
+# the block parser lives with the neural network code
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'neural-network'))
+import csv_columns
+
+
 def main(argv):
-    # get files
-    input = open(sys.argv[1], 'r')
-    output = open(sys.argv[1][:-4] + '_subset.csv', 'w')
+    # usage: python subset.py <flight data file> [stride]
+    stride = int(argv[2]) if len(argv) > 2 else 1000
 
-    line_num = 0
-    for line in input:
-        if line_num % 1000 == 0:
-            output.write(line)
-        line_num += 1
+    # keep the header and every stride-th line, reading the file in large blocks
+    with open(argv[1][:-4] + '_subset.csv', 'wb') as output:
+        for lines in csv_columns.read_lines(argv[1], stride=stride):
+            output.write(lines)
 
 
 if __name__ == "__main__":
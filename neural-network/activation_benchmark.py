@@ -0,0 +1,137 @@
+"""activation_benchmark.py: Speed and accuracy of the activation functions available to the matrix engine.
+
+Measured on the 2004/2007 subsets (1 hidden layer of 5 nodes, batches of 32, 200 iterations) and random inputs:
+
+    activation   1e6 values   max error   ms/iteration   accuracy
+    allocating      3.4 ms    0           -              -
+    sigmoid         3.3 ms    0           3.60           0.5269
+    float32         2.0 ms    9e-8        3.51           0.5269
+    lookup         31.3 ms    7e-7        -              - (4096 entry interpolated table, not offered)
+
+NumPy evaluates exp with vector instructions, so an interpolated lookup table costs far more than it saves. The fast
+mode computes the sigmoid in single precision instead, which pays off on large blocks; on small batches the training
+time is dominated by per-call overhead and both modes take about as long.
+"""
+
+__author__ = "Jordon Dornbos"
+
+import logging
+import random
+import sys
+import timeit
+import numpy
+import multilayer_network
+import back_prop_learning
+import training
+import vectorized
+
+LOOKUP_RANGE = 16.0
+LOOKUP_SIZE = 4096
+
+
+def sigmoid_allocating(x):
+    """The sigmoid function as originally written for arrays, allocating a new array per operation.
+
+    Args:
+        x: The values to use in the sigmoid computation.
+
+    Returns:
+        The sigmoid values for x.
+    """
+
+    return 1.0 / (1.0 + numpy.exp(-x))
+
+
+def lookup_sigmoid():
+    """Function to build a sigmoid function that interpolates in a table of precomputed values.
+
+    Returns:
+        The sigmoid function, accurate to within 1e-6 and clamped outside [-LOOKUP_RANGE, LOOKUP_RANGE].
+    """
+
+    table = sigmoid_allocating(numpy.linspace(-LOOKUP_RANGE, LOOKUP_RANGE, LOOKUP_SIZE + 1))
+    scale = LOOKUP_SIZE / (2.0 * LOOKUP_RANGE)
+
+    def sigmoid_lookup(x):
+        position = numpy.clip((x + LOOKUP_RANGE) * scale, 0.0, LOOKUP_SIZE - 1e-9)
+        index = position.astype(numpy.intp)
+        fraction = position - index
+        return table[index] + fraction * (table[index + 1] - table[index])
+
+    return sigmoid_lookup
+
+
+def time_activation(activation, size, number=50):
+    """Function to time an activation function on random values.
+
+    Args:
+        activation: The activation function to time.
+        size: The number of values per call.
+        number: The number of calls per measurement.
+
+    Returns:
+        The fastest time per call in seconds.
+    """
+
+    x = numpy.random.randn(size) * 4.0
+    return min(timeit.repeat(lambda: activation(x), number=number, repeat=5)) / number
+
+
+def max_error(activation):
+    """Function to measure the largest difference between an activation function and the exact sigmoid.
+
+    Args:
+        activation: The activation function to measure.
+
+    Returns:
+        The largest absolute difference over [-30, 30].
+    """
+
+    x = numpy.linspace(-30.0, 30.0, 2000001)
+    return float(numpy.max(numpy.abs(activation(x) - sigmoid_allocating(x))))
+
+
+def training_accuracy(activation_name, training_data, verification_data, iteration_max=200, batch_size=32):
+    """Function to train a network with an activation function and test its accuracy.
+
+    Args:
+        activation_name: The name of the activation function in vectorized.ACTIVATIONS.
+        training_data: The examples to train with.
+        verification_data: The examples to test with.
+        iteration_max: The amount of iterations to train for.
+        batch_size: The number of examples per weight update.
+
+    Returns:
+        The time taken per iteration in seconds and the accuracy on the verification data.
+    """
+
+    random.seed(0)
+    network = multilayer_network.MultilayerNetwork(4, 1, 5, 1, activation=activation_name)
+    start = timeit.default_timer()
+    hypothesis = back_prop_learning.back_prop_learning(training_data, network, iteration_max=iteration_max,
+                                                       batch_size=batch_size)
+    seconds = (timeit.default_timer() - start) / iteration_max
+
+    return seconds, training.test(hypothesis, verification_data)
+
+
+def main(argv):
+    activations = [('allocating', sigmoid_allocating), ('sigmoid', vectorized.sigmoid),
+                   ('float32', vectorized.sigmoid_float32), ('lookup', lookup_sigmoid())]
+
+    print('activation,size,microseconds,max_error')
+    for name, activation in activations:
+        error = max_error(activation)
+        for size in (32, 2332, 100000, 1000000):
+            print('{0},{1},{2:.2f},{3:.1e}'.format(name, size, time_activation(activation, size) * 1e6, error))
+
+    training_data, verification_data = training.load_data()
+    print('activation,milliseconds_per_iteration,accuracy')
+    for name in sorted(vectorized.ACTIVATIONS):
+        seconds, accuracy = training_accuracy(name, training_data, verification_data)
+        print('{0},{1:.3f},{2:.4f}'.format(name, seconds * 1e3, accuracy))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(filename=training.LOG_FILENAME, level=logging.INFO)
+    main(sys.argv)
@@ -2,45 +2,180 @@
 
 __author__ = "Jordon Dornbos"
 
+import os
 import random
+import checkpoint
 import hypothesis_network
 import multilayer_network
+import optimizers
+import vectorized
 import logging
+import time
 
 
-def back_prop_learning(examples, network, alpha=0.3, iteration_max=5000000, weights=None, verbose=False):
+def back_prop_learning(examples, network, alpha=0.3, iteration_max=5000000, weights=None, verbose=False,
+                       engine='matrix', batch_size=1, validation_examples=None, patience=None, min_improvement=0.0,
+                       time_budget=None, checkpoint_filename=None, checkpoint_interval=None, resume=False, hooks=None,
+                       hook_interval=1, optimizer=None, schedule=None):
     """Backpropagation algorithm for learning in multilayer networks.
 
     Args:
-        examples: A set of examples, each with input vector x and output vector y.
+        examples: A set of examples, each with input vector x and output vector y, or a source of blocks of examples
+            (see vectorized.as_blocks) which always learns with the matrix engine.
         network: A multilayer network with L layers, weights W(j,i), activation function g.
         alpha: The learning rate.
         iteration_max: The maximum amount of iterations to perform.
         weights: Starting weights to load into the network.
         verbose: Whether or not to print data values as the network learns.
+        engine: Either 'node' to learn one perceptron at a time or 'matrix' to learn with a weight matrix per layer.
+        batch_size: The number of examples to learn from per weight update, None to use every example in a block at
+            once. Sizes other than 1 always learn with the matrix engine.
+        validation_examples: Held-out examples to measure the error on after every iteration, the weights with the
+            lowest error are kept. The training examples of the first iteration are used if not given (up to
+            vectorized.RECORDED_ROWS of them).
+        patience: The number of iterations in a row the error may fail to improve before learning stops, None to
+            never stop early (unless min_improvement is given, in which case it defaults to 1).
+        min_improvement: The amount the error has to drop by to count as an improvement.
+        time_budget: The number of seconds after which learning stops, None for no limit.
+        checkpoint_filename: The file to save the network and the learning progress to.
+        checkpoint_interval: The number of iterations between checkpoints, None to only save when learning stops.
+        resume: Whether to continue from the weights, position in the alpha schedule and optimizer state stored in
+            checkpoint_filename (if it exists) instead of starting from the given or random weights.
+        hooks: Functions called with a map of the 'iteration', 'alpha', 'seconds' taken, seconds spent in the
+            'forward', 'delta' and 'update' phases and training 'error' of sampled iterations (see telemetry.py). The
+            error is measured on the examples of the first iteration, up to vectorized.RECORDED_ROWS of them.
+        hook_interval: The hooks are called every this many iterations.
+        optimizer: The optimizer to update the weights with (see optimizers.py), which always learns with the matrix
+            engine. None to add alpha times the weight changes.
+        schedule: A function of alpha, the iteration and iteration_max returning the learning rate of the iteration
+            (see optimizers.SCHEDULES), None to drop the learning rate linearly to zero.
 
     Returns:
-        A hypothesis neural network.
+        A hypothesis neural network, holding the weights with the lowest error seen when the error was measured.
     """
 
-    delta = [0] * network.num_nodes()   # a vector of errors, indexed by network node
-
-    # load weights if given, otherwise randomize weights
-    if weights:
+    start_iteration = 0
+
+    # load weights from the checkpoint or if given, otherwise randomize weights
+    if resume and checkpoint_filename is not None and os.path.exists(checkpoint_filename):
+        header = checkpoint.read_header(checkpoint_filename)
+        if not checkpoint.matches(header, network):
+            raise ValueError('{0} does not hold a network of the same shape'.format(checkpoint_filename))
+        network.load_weights(checkpoint.read_weights(checkpoint_filename, header))
+        if optimizer is not None:
+            checkpoint.read_optimizer(checkpoint_filename, header, optimizer, vectorized.layer_matrices(network))
+        start_iteration, iteration_max, alpha = header['iteration'], header['iteration_max'], header['alpha']
+        logging.info('Resuming from iteration {0} of {1}'.format(start_iteration, iteration_max))
+    elif weights is not None:
         network.load_weights(weights)
     else:
         randomize_weights(network, verbose=verbose)
 
+    if batch_size != 1 or hasattr(examples, 'blocks') or optimizer is not None:
+        engine = 'matrix'
+
+    if schedule is None:
+        schedule = optimizers.LinearSchedule()
+
+    if engine == 'matrix':
+        delta = None
+        matrices = vectorized.layer_matrices(network)
+        activation = vectorized.ACTIVATIONS[network.activation]
+        examples = vectorized.as_blocks(examples)
+    else:
+        delta = [0] * network.num_nodes()   # a vector of errors, indexed by network node
+
+    # only measure the error if it is used to stop learning
+    measure_error = validation_examples is not None or patience is not None or min_improvement > 0
+
+    # the training error is measured on the examples of the first iteration as they were learned, asking the source
+    # for them again would draw a new order from a sampler or read a file source again
+    recorded_examples = None
+    training_error_examples = None
+    if hooks or (measure_error and validation_examples is None):
+        if engine == 'matrix':
+            recorded_examples = vectorized.RecordedBlocks()
+            training_error_examples = recorded_examples
+        else:
+            training_error_examples = vectorized.as_blocks(examples)
+
+    if measure_error:
+        if patience is None and min_improvement > 0:
+            patience = 1
+        if validation_examples is not None:
+            error_examples = vectorized.as_blocks(validation_examples)
+        else:
+            error_examples = training_error_examples
+        best_error = float('inf')
+        best_weights = network.copy_weights()
+        iterations_without_improvement = 0
+
+    start_time = time.time()
+    epochs = 0
+
     # keep learning until stopping criterion is satisfied
-    for iteration in range(iteration_max):
-        new_alpha = alpha * (1 - (float(iteration) / iteration_max))
-        learn_loop(delta, examples, network, new_alpha)
+    for iteration in range(start_iteration, iteration_max):
+        new_alpha = schedule(alpha, iteration, iteration_max)
+
+        # only time the iterations sampled for the hooks
+        timings = None
+        if hooks and (iteration - start_iteration) % hook_interval == 0:
+            timings = {'forward': 0.0, 'delta': 0.0, 'update': 0.0}
+            iteration_start = time.perf_counter()
+
+        if engine == 'matrix':
+            for x, y in examples.blocks():
+                if recorded_examples is not None and iteration == start_iteration:
+                    recorded_examples.record(x, y)
+                vectorized.learn_loop(matrices, x, y, new_alpha, batch_size, activation, timings, optimizer)
+        else:
+            learn_loop(delta, examples, network, new_alpha, timings)
+        epochs += 1
+
+        if timings is not None:
+            record = {'iteration': iteration, 'alpha': new_alpha, 'seconds': time.perf_counter() - iteration_start}
+            record.update(timings)
+            record['error'] = vectorized.block_error(vectorized.layer_matrices(network), training_error_examples,
+                                                     vectorized.ACTIVATIONS[network.activation])
+            for hook in hooks:
+                hook(record)
+
+        if checkpoint_interval is not None and checkpoint_filename is not None and \
+                (iteration + 1) % checkpoint_interval == 0:
+            checkpoint.save(checkpoint_filename, network, iteration + 1, iteration_max, alpha, optimizer)
 
         if verbose:
             logging.info('Neural network learning loop {0} of {1} with alpha: {2}'.format(iteration, iteration_max,
                                                                                           new_alpha))
 
-    return hypothesis_network.HypothesisNetwork(network)
+        if measure_error:
+            error = vectorized.block_error(vectorized.layer_matrices(network), error_examples,
+                                           vectorized.ACTIVATIONS[network.activation])
+            if error < best_error - min_improvement:
+                iterations_without_improvement = 0
+            else:
+                iterations_without_improvement += 1
+
+            # remember the best weights seen, even if they did not improve by enough
+            if error < best_error:
+                best_error = error
+                best_weights = network.copy_weights()
+
+            if patience is not None and iterations_without_improvement >= patience:
+                logging.info('Stopping after {0} iterations, error has not improved in {1}'.format(epochs, patience))
+                break
+
+        if time_budget is not None and time.time() - start_time >= time_budget:
+            logging.info('Stopping after {0} iterations, time budget of {1}s used'.format(epochs, time_budget))
+            break
+
+    if measure_error:
+        network.load_weights(best_weights)
+
+    if checkpoint_filename is not None:
+        checkpoint.save(checkpoint_filename, network, start_iteration + epochs, iteration_max, alpha, optimizer)
+
+    return hypothesis_network.HypothesisNetwork(network, engine=engine, epochs=epochs)
 
 
 def randomize_weights(network, verbose=False, round=False):
@@ -60,7 +195,7 @@ def randomize_weights(network, verbose=False, round=False):
         logging.info('Randomized weights: {0}'.format(network.weight_string(round)))
 
 
-def learn_loop(delta, examples, network, alpha):
+def learn_loop(delta, examples, network, alpha, timings=None):
     """A loop representing the learning process.
 
     Args:
@@ -68,23 +203,38 @@ def learn_loop(delta, examples, network, alpha):
         examples: A set of examples, each with input vector x and output vector y.
         network: A multilayer network with L layers, weights W(j,i), activation function g.
         alpha: The learning rate.
+        timings: A map to add the seconds spent in the 'forward', 'delta' and 'update' phases to, None to not time them.
     """
 
+    output_layer = network.output_layer
+    output_position = network.position_in_network(network.num_layers() - 1, 0)
     for example in examples:
+        if timings is not None:
+            phase_start = time.perf_counter()
+
         load_and_feed(example.x, network)
 
         # compute the error at the output
-        for n in range(network.output_layer.num_nodes):
-            delta[network.position_in_network(network.num_layers() - 1, n)] = \
-                multilayer_network.sigmoid_derivative(network.output_layer.nodes[n].in_sum) * \
-                (example.y[n] - network.output_layer.nodes[n].output)
+        outputs = output_layer.outputs.tolist()
+        for n in range(output_layer.num_nodes):
+            delta[output_position + n] = multilayer_network.sigmoid_output_derivative(outputs[n]) * \
+                (example.y[n] - outputs[n])
+
+        if timings is not None:
+            phase_start = vectorized.add_timing(timings, 'forward', phase_start)
 
         # propagate the deltas backward from output layer to input layer
         delta_propagation(delta, network)
 
+        if timings is not None:
+            phase_start = vectorized.add_timing(timings, 'delta', phase_start)
+
         # update every weight in the network using deltas
         update_weights(delta, network, alpha)
 
+        if timings is not None:
+            vectorized.add_timing(timings, 'update', phase_start)
+
 
 def load_and_feed(input, network):
     """Function to load the input into the network and propagate the data through the network.
@@ -95,8 +245,7 @@ def load_and_feed(input, network):
     """
 
     # propagate the inputs forward to compute the outputs
-    for i in range(len(network.input_layer.nodes)):
-        network.input_layer.nodes[i].output = input[i]
+    network.input_layer.outputs[:] = input[:network.input_layer.num_nodes]
 
     # feed the values forward
     feed_forward(network)
@@ -105,21 +254,30 @@ def load_and_feed(input, network):
 def feed_forward(network):
     """Function to feed forward values in the network.
 
+    The weights and outputs of every layer are read once as Python floats, which is much faster than indexing the
+    network buffers one value at a time.
+
     Args:
         network: A multilayer network with L layers, weights W(j,i), activation function g.
     """
 
+    inputs = network.input_layer.outputs.tolist()
     for l in range(1, network.num_layers()):
-        for n in range(network.get_layer(l).num_nodes):
-            node = network.get_node_in_layer(l, n)
-
+        layer = network.get_layer(l)
+        in_sums = []
+        outputs = []
+        for weights in layer.weights.tolist():
             summation = 0.0
-            for i in range(node.num_inputs):
-                summation += node.weights[i] * network.get_node_in_layer(l - 1, i).output
-            summation += node.weights[len(node.weights) - 1]    # bias input
+            for i in range(len(inputs)):
+                summation += weights[i] * inputs[i]
+            summation += weights[len(weights) - 1]  # bias input
+
+            in_sums.append(summation)
+            outputs.append(multilayer_network.sigmoid(summation))
 
-            network.get_node_in_layer(l, n).in_sum = summation
-            network.get_node_in_layer(l, n).output = multilayer_network.sigmoid(summation)
+        layer.in_sums[:] = in_sums
+        layer.outputs[:] = outputs
+        inputs = outputs
 
 
 def delta_propagation(delta, network):
@@ -131,15 +289,17 @@ def delta_propagation(delta, network):
     """
 
     for l in range(network.num_layers() - 2, 0, -1):
-        for n in range(network.get_layer(l).num_nodes):
+        outputs = network.get_layer(l).outputs.tolist()
+        next_layer_weights = network.get_layer(l + 1).weights.tolist()
+        next_position = network.position_in_network(l + 1, 0)
+        for n in range(len(outputs)):
             summation = 0.0
-            next_layer_nodes = network.get_layer(l + 1).nodes
-            for nln in range(len(next_layer_nodes)):
-                summation += next_layer_nodes[nln].weights[n] * delta[network.position_in_network(l + 1, nln)]
+            for nln in range(len(next_layer_weights)):
+                summation += next_layer_weights[nln][n] * delta[next_position + nln]
 
             # "blame" a node as much as its weight
             delta[network.position_in_network(l, n)] = \
-                multilayer_network.sigmoid_derivative(network.get_node_in_layer(l, n).in_sum) * summation
+                multilayer_network.sigmoid_output_derivative(outputs[n]) * summation
 
 
 def update_weights(delta, network, alpha):
@@ -152,10 +312,15 @@ def update_weights(delta, network, alpha):
     """
 
     for l in range(1, network.num_layers()):
-        for n in range(network.get_layer(l).num_nodes):
+        layer = network.get_layer(l)
+        inputs = network.get_layer(l - 1).outputs.tolist()
+        layer_weights = layer.weights.tolist()
+        for n in range(len(layer_weights)):
             # adjust the weights
-            node = network.get_node_in_layer(l, n)
-            for i in range(node.num_inputs):
-                node.weights[i] += alpha * network.get_node_in_layer(l - 1, i).output * \
-                                   delta[network.position_in_network(l, n)]
-            node.weights[len(node.weights) - 1] += alpha * delta[network.position_in_network(l, n)]   # bias input
+            weights = layer_weights[n]
+            node_delta = delta[network.position_in_network(l, n)]
+            for i in range(len(inputs)):
+                weights[i] += alpha * inputs[i] * node_delta
+            weights[len(weights) - 1] += alpha * node_delta   # bias input
+
+        layer.weights[:] = layer_weights
@@ -0,0 +1,326 @@
+"""benchmark.py: Training and inference throughput benchmarks.
+
+Usage:
+    python benchmark.py [--output results.json] [--baseline baseline.json] [--tolerance 0.2] [--quick]
+
+Every result records the examples per second, the seconds per pass over the examples (per epoch for training) and the
+peak memory allocated while running. When a baseline file from an earlier run is given, any benchmark whose throughput
+dropped by more than the tolerance is reported and the exit status is 1.
+"""
+
+__author__ = "Jordon Dornbos"
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import timeit
+import tracemalloc
+import numpy
+import back_prop_learning
+import example
+import flight_data
+import hypothesis_network
+import multilayer_network
+import quantized
+import training
+import vectorized
+
+FLIGHT_FILENAME = '../data/flight/2004_subset.csv'
+NORMALIZED_FILENAME = '../data/normalized/2004_output.txt'
+
+# the per-node engine is only run on this many examples, it is too slow for the larger data sets
+NODE_ROWS_MAX = 2000
+
+
+def measure(function, repeat=3):
+    """Function to time a function.
+
+    Args:
+        function: The function to call with no arguments.
+        repeat: The number of times to call it.
+
+    Returns:
+        The fastest time taken by a call in seconds.
+    """
+
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def peak_memory(function):
+    """Function to measure the memory allocated by a function.
+
+    Args:
+        function: The function to call with no arguments.
+
+    Returns:
+        The peak number of bytes allocated during the call.
+    """
+
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def result(name, engine, size, rows, seconds, peak_bytes, layers=None, nodes=None):
+    """Function to build the record of one benchmark.
+
+    Args:
+        name: The name of the benchmark.
+        engine: The engine or loader benchmarked.
+        size: The number of examples in the data set benchmarked with.
+        rows: The number of examples processed per call.
+        seconds: The time taken per call.
+        peak_bytes: The peak number of bytes allocated per call.
+        layers: The number of hidden layers in the network, if any.
+        nodes: The number of nodes per hidden layer, if any.
+
+    Returns:
+        A map of the benchmark values.
+    """
+
+    return {'name': name, 'engine': engine, 'layers': layers, 'nodes': nodes, 'size': size, 'rows': rows,
+            'seconds': seconds, 'examples_per_second': rows / seconds if seconds > 0 else float('inf'),
+            'peak_bytes': peak_bytes}
+
+
+def result_key(record):
+    """Function to identify a benchmark across runs.
+
+    Args:
+        record: A map of benchmark values.
+
+    Returns:
+        A string identifying the benchmark.
+    """
+
+    return '{0}/{1}/{2}x{3}/{4}'.format(record['name'], record['engine'], record['layers'], record['nodes'],
+                                         record['size'])
+
+
+def synthetic_examples(rows, num_inputs=4, num_outputs=1, seed=0):
+    """Function to create random examples shaped like the flight data.
+
+    Args:
+        rows: The number of examples.
+        num_inputs: The number of inputs per example.
+        num_outputs: The number of outputs per example.
+        seed: The random seed.
+
+    Returns:
+        A matrix with one input vector per row and a matrix with one output vector per row.
+    """
+
+    generator = numpy.random.RandomState(seed)
+    x = generator.uniform(0.0, 0.5, (rows, num_inputs))
+    y = (generator.uniform(size=(rows, num_outputs)) < 0.25).astype(numpy.float64)
+
+    return x, y
+
+
+def synthetic_flight_file(filename, rows):
+    """Function to write a flight data file of a given size by repeating the rows of the subset file.
+
+    Args:
+        filename: The file to write.
+        rows: The number of rows to write after the header.
+    """
+
+    with open(FLIGHT_FILENAME) as file:
+        header = next(file)
+        lines = file.readlines()
+
+    with open(filename, 'w') as file:
+        file.write(header)
+        for i in range(rows // len(lines)):
+            file.writelines(lines)
+        file.writelines(lines[:rows % len(lines)])
+
+
+def network_benchmarks(layers, nodes, x, y, batch_size, repeat):
+    """Function to benchmark the forward pass, one learning loop and guessing for one network shape.
+
+    Args:
+        layers: The number of hidden layers.
+        nodes: The number of nodes per hidden layer.
+        x: A matrix with one input vector per row.
+        y: A matrix with one output vector per row.
+        batch_size: The batch size of the batched learning loop.
+        repeat: The number of times to repeat every measurement.
+
+    Returns:
+        A list of benchmark records.
+    """
+
+    random.seed(0)
+    network = multilayer_network.MultilayerNetwork(x.shape[1], layers, nodes, y.shape[1])
+    back_prop_learning.randomize_weights(network)
+    hypothesis = hypothesis_network.HypothesisNetwork(network)
+    matrices = vectorized.layer_matrices(network)
+    start_weights = network.copy_weights()
+
+    node_x = x[:NODE_ROWS_MAX].tolist()
+    node_examples = [example.Example(i, o) for i, o in zip(node_x, y[:NODE_ROWS_MAX].tolist())]
+    delta = [0] * network.num_nodes()
+
+    def node_feed_forward():
+        for input in node_x:
+            back_prop_learning.load_and_feed(input, network)
+
+    def node_learn_loop():
+        back_prop_learning.learn_loop(delta, node_examples, network, 0.1)
+
+    def node_guess():
+        for input in node_x:
+            hypothesis.guess(input, engine='node')
+
+    def matrix_learn_loop():
+        vectorized.learn_loop(matrices, x, y, 0.1, batch_size)
+
+    # frozen copies guess from single precision inputs, as a server would keep them
+    x32 = x.astype(numpy.float32)
+    float32_network = quantized.freeze(network, 'float32')
+    int8_network = quantized.freeze(network, 'int8', x32[:quantized.CALIBRATION_ROWS])
+
+    benchmarks = [('feed_forward', 'node', len(node_x), node_feed_forward),
+                  ('feed_forward', 'matrix', len(x), lambda: vectorized.feed_forward(matrices, x)),
+                  ('learn_loop', 'node', len(node_x), node_learn_loop),
+                  ('learn_loop', 'matrix-batch{0}'.format(batch_size), len(x), matrix_learn_loop),
+                  ('guess', 'node', len(node_x), node_guess),
+                  ('guess_batch', 'matrix', len(x), lambda: hypothesis.guess_batch(x)),
+                  ('guess_batch', 'float32', len(x), lambda: float32_network.guess_batch(x32)),
+                  ('guess_batch', 'int8', len(x), lambda: int8_network.guess_batch(x32))]
+
+    records = []
+    for name, engine, rows, function in benchmarks:
+        seconds = measure(function, repeat)
+        peak_bytes = peak_memory(function)
+        network.load_weights(start_weights)     # learning loops should not drift between shapes
+        records.append(result(name, engine, len(x), rows, seconds, peak_bytes, layers, nodes))
+
+    return records
+
+
+def loading_benchmarks(rows, repeat):
+    """Function to benchmark loading a flight data file of a given size.
+
+    Args:
+        rows: The number of rows in the file.
+        repeat: The number of times to repeat every measurement.
+
+    Returns:
+        A list of benchmark records.
+    """
+
+    normalized_data = flight_data.get_normalized_data(NORMALIZED_FILENAME)
+    file, filename = tempfile.mkstemp(suffix='.csv')
+    os.close(file)
+    try:
+        synthetic_flight_file(filename, rows)
+
+        def get_data():
+            flight_data.get_data(filename, *normalized_data)
+
+        def read_blocks():
+            for x, y in flight_data.read_blocks(filename, normalized_data):
+                pass
+
+        return [result('load', 'get_data', rows, rows, measure(get_data, repeat), peak_memory(get_data)),
+                result('load', 'read_blocks', rows, rows, measure(read_blocks, repeat), peak_memory(read_blocks))]
+    finally:
+        os.remove(filename)
+
+
+def run(shapes, sizes, batch_size=32, repeat=3):
+    """Function to run every benchmark.
+
+    Args:
+        shapes: A list of (layers, nodes) network shapes.
+        sizes: A list of the numbers of examples to benchmark with.
+        batch_size: The batch size of the batched learning loop.
+        repeat: The number of times to repeat every measurement.
+
+    Returns:
+        A list of benchmark records.
+    """
+
+    records = []
+    for rows in sizes:
+        x, y = synthetic_examples(rows)
+        for layers, nodes in shapes:
+            records.extend(network_benchmarks(layers, nodes, x, y, batch_size, repeat))
+        records.extend(loading_benchmarks(rows, repeat))
+
+    return records
+
+
+def compare(records, baseline, tolerance):
+    """Function to find the benchmarks that got slower than a baseline.
+
+    Args:
+        records: A list of benchmark records.
+        baseline: A list of benchmark records from an earlier run.
+        tolerance: The fraction of throughput a benchmark may lose before it counts as a regression.
+
+    Returns:
+        A list of (key, baseline examples per second, examples per second) for every regression.
+    """
+
+    baseline = dict((result_key(record), record) for record in baseline)
+    regressions = []
+    for record in records:
+        key = result_key(record)
+        if key in baseline:
+            before = baseline[key]['examples_per_second']
+            if record['examples_per_second'] < before * (1.0 - tolerance):
+                regressions.append((key, before, record['examples_per_second']))
+
+    return regressions
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Training and inference throughput benchmarks.')
+    parser.add_argument('--output', help='file to write the results to as JSON (default: standard output)')
+    parser.add_argument('--baseline', help='results of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed fractional loss of throughput')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[7000, 100000, 1000000],
+                        help='numbers of examples to benchmark with')
+    parser.add_argument('--batch-size', type=int, default=32, help='batch size of the batched learning loop')
+    parser.add_argument('--repeat', type=int, default=3, help='times to repeat every measurement')
+    parser.add_argument('--quick', action='store_true', help='only benchmark the smallest and largest network')
+    args = parser.parse_args(argv[1:])
+
+    # the same grid test.main sweeps
+    shapes = [(layers, nodes) for layers in range(1, 4) for nodes in range(3, 11)]
+    if args.quick:
+        shapes = [shapes[0], shapes[-1]]
+
+    records = run(shapes, args.sizes, args.batch_size, args.repeat)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(records, file, indent=1)
+    else:
+        json.dump(records, sys.stdout, indent=1)
+        sys.stdout.write('\n')
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(records, json.load(file), args.tolerance)
+        for key, before, after in regressions:
+            sys.stderr.write('Regression in {0}: {1:.0f} -> {2:.0f} examples/sec\n'.format(key, before, after))
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(filename=training.LOG_FILENAME, level=logging.INFO)
+    sys.exit(main(sys.argv))
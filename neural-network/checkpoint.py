@@ -0,0 +1,175 @@
+"""checkpoint.py: Binary checkpoints of multilayer networks and their training progress."""
+
+__author__ = "Jordon Dornbos"
+
+import os
+import struct
+import numpy
+import hypothesis_network
+import multilayer_network
+
+MAGIC = b'NNCK'
+VERSION = 2
+
+# the versions that can still be read, version 1 has no optimizer state (its header is zero padded where version 2
+# keeps the number of optimizer slots and steps)
+READABLE_VERSIONS = (1, 2)
+
+# magic, version, input nodes, hidden layers, nodes per hidden layer, output nodes, activation, iteration,
+# iteration_max, alpha, number of weights, number of optimizer slots and optimizer steps; the weights follow as
+# float64 values at HEADER_SIZE, then the values the optimizer keeps per weight, one slot after the other
+HEADER_FORMAT = '<4sI4I16sQQdQIQ'
+HEADER_SIZE = 128
+
+
+def save(filename, network, iteration=0, iteration_max=0, alpha=0.0, optimizer=None):
+    """Function to write a network and its training progress to a checkpoint file.
+
+    The checkpoint is written to a temporary file and renamed, so an existing checkpoint is never left half written.
+
+    Args:
+        filename: The checkpoint file to write.
+        network: A multilayer network with L layers, weights W(j,i), activation function g.
+        iteration: The number of learning iterations completed.
+        iteration_max: The maximum amount of iterations of the learning schedule.
+        alpha: The starting learning rate of the learning schedule.
+        optimizer: The optimizer the network is learning with (see optimizers.py), whose values kept per weight and
+            number of steps are saved so learning can resume where it stopped. None if learning without one.
+    """
+
+    # the optimizer has no values until its first step
+    state = optimizer.state if optimizer is not None and optimizer.state is not None else numpy.empty((0, 0))
+    steps = getattr(optimizer, 'steps', 0)
+
+    header = struct.pack(HEADER_FORMAT, MAGIC, VERSION, network.num_input_nodes, network.num_hidden_layers,
+                         network.num_nodes_per_hidden_layer, network.num_output_nodes,
+                         network.activation.encode('ascii'), iteration, iteration_max, alpha, len(network.weights),
+                         len(state), steps)
+
+    with open(filename + '.tmp', 'wb') as file:
+        file.write(header.ljust(HEADER_SIZE, b'\0'))
+        network.weights.astype('<f8').tofile(file)
+        state.astype('<f8').tofile(file)
+    os.replace(filename + '.tmp', filename)
+
+
+def read_header(filename):
+    """Function to read the header of a checkpoint file.
+
+    Args:
+        filename: The checkpoint file to read.
+
+    Returns:
+        A map of the network shape and training progress stored in the checkpoint.
+    """
+
+    with open(filename, 'rb') as file:
+        values = struct.unpack(HEADER_FORMAT, file.read(struct.calcsize(HEADER_FORMAT)))
+
+    if values[0] != MAGIC or values[1] not in READABLE_VERSIONS:
+        raise ValueError('{0} is not a version {1} network checkpoint'.format(filename, VERSION))
+
+    return {'num_input_nodes': values[2], 'num_hidden_layers': values[3], 'num_nodes_per_hidden_layer': values[4],
+            'num_output_nodes': values[5], 'activation': values[6].rstrip(b'\0').decode('ascii'),
+            'iteration': values[7], 'iteration_max': values[8], 'alpha': values[9], 'num_weights': values[10],
+            'optimizer_slots': values[11], 'optimizer_steps': values[12]}
+
+
+def read_weights(filename, header, mmap=False):
+    """Function to read the weights of a checkpoint file.
+
+    Args:
+        filename: The checkpoint file to read.
+        header: The header of the checkpoint file.
+        mmap: Whether to map the weights read-only from the file instead of reading them into memory.
+
+    Returns:
+        The flat weight buffer stored in the checkpoint.
+    """
+
+    if mmap:
+        return numpy.memmap(filename, dtype='<f8', mode='r', offset=HEADER_SIZE, shape=(header['num_weights'],))
+
+    with open(filename, 'rb') as file:
+        file.seek(HEADER_SIZE)
+        return numpy.fromfile(file, dtype='<f8', count=header['num_weights']).astype(numpy.float64)
+
+
+def read_optimizer(filename, header, optimizer, matrices):
+    """Function to restore the values an optimizer keeps per weight and its number of steps from a checkpoint file.
+
+    Args:
+        filename: The checkpoint file to read.
+        header: The header of the checkpoint file.
+        optimizer: The optimizer to restore, of the same kind as the one the checkpoint was saved with.
+        matrices: A list of weight matrices where index l - 1 holds the weights of layer l.
+    """
+
+    if header['optimizer_slots'] == 0:
+        # saved before the optimizer took a step, or without one keeping values per weight
+        return
+
+    if header['optimizer_slots'] != optimizer.num_slots:
+        raise ValueError('{0} was saved with an optimizer keeping {1} values per weight, not {2}'.format(
+            filename, header['optimizer_slots'], optimizer.num_slots))
+
+    optimizer.prepare(matrices)
+    with open(filename, 'rb') as file:
+        file.seek(HEADER_SIZE + header['num_weights'] * 8)
+        optimizer.state[:] = numpy.fromfile(file, dtype='<f8', count=optimizer.state.size).reshape(
+            optimizer.state.shape)
+    if hasattr(optimizer, 'steps'):
+        optimizer.steps = header['optimizer_steps']
+
+
+def matches(header, network):
+    """Function to check whether a checkpoint holds a network of the same shape as a given network.
+
+    Args:
+        header: The header of the checkpoint file.
+        network: A multilayer network with L layers, weights W(j,i), activation function g.
+
+    Returns:
+        Whether the weights of the checkpoint can be loaded into the network.
+    """
+
+    return (header['num_input_nodes'] == network.num_input_nodes and
+            header['num_hidden_layers'] == network.num_hidden_layers and
+            header['num_nodes_per_hidden_layer'] == network.num_nodes_per_hidden_layer and
+            header['num_output_nodes'] == network.num_output_nodes)
+
+
+def load_network(filename, mmap=False):
+    """Function to create a network from a checkpoint file.
+
+    Args:
+        filename: The checkpoint file to read.
+        mmap: Whether the weights of the network should be a read-only map of the file, which starts instantly and is
+            shared between processes serving the same checkpoint, but cannot be trained further.
+
+    Returns:
+        The network and the header of the checkpoint.
+    """
+
+    header = read_header(filename)
+    network = multilayer_network.MultilayerNetwork(header['num_input_nodes'], header['num_hidden_layers'],
+                                                   header['num_nodes_per_hidden_layer'], header['num_output_nodes'],
+                                                   header['activation'], read_weights(filename, header, mmap))
+
+    return network, header
+
+
+def load_hypothesis(filename, mmap=True):
+    """Function to create a hypothesis network for serving from a checkpoint file.
+
+    Args:
+        filename: The checkpoint file to read.
+        mmap: Whether the weights should be a read-only map of the file.
+
+    Returns:
+        A hypothesis neural network.
+    """
+
+    network, header = load_network(filename, mmap)
+
+    return hypothesis_network.HypothesisNetwork(network, epochs=header['iteration'])
@@ -0,0 +1,135 @@
+"""cross_validation.py: Parallel k-fold cross validation of network parameters over a shared data set."""
+
+__author__ = "Jordon Dornbos"
+
+import logging
+import random
+import numpy
+import ingest
+import sampling
+import training
+
+# data attached once in every worker process
+_dataset = None
+_folds = None
+
+
+def fold_assignment(rows, num_folds, time_blocked=False, seed=None):
+    """Function to assign every example to a fold.
+
+    Args:
+        rows: The number of examples.
+        num_folds: The number of folds.
+        time_blocked: Whether every fold is a contiguous run of examples (so a fold holds a period of time when the
+            examples are in time order) instead of a random selection.
+        seed: The seed of the random assignment.
+
+    Returns:
+        An array holding the fold of every example.
+    """
+
+    if time_blocked:
+        return numpy.arange(rows) * num_folds // rows
+
+    folds = numpy.arange(rows) % num_folds
+    numpy.random.default_rng(seed).shuffle(folds)
+    return folds
+
+
+def init_worker(descriptor, num_folds, time_blocked, seed):
+    """Function to attach a worker process to the shared data set and split it into the same folds as every worker.
+
+    Args:
+        descriptor: The descriptor of the shared data set.
+        num_folds: The number of folds.
+        time_blocked: Whether every fold is a contiguous run of examples.
+        seed: The seed of the random assignment of examples to folds.
+    """
+
+    global _dataset, _folds
+    _dataset = ingest.SharedDataset.attach(descriptor)
+    _folds = fold_assignment(_dataset.rows, num_folds, time_blocked, seed)
+
+
+def run_fold(job):
+    """Function to train a network on every fold but one and test it on that fold.
+
+    Args:
+        job: A tuple of the parameters (layers, nodes, alpha), the fold to test on, the maximum amount of iterations,
+            the batch size, the names of the optimizer and schedule and the random seed (None to leave the generator
+            alone).
+
+    Returns:
+        The parameters, the fold and the accuracy on the fold.
+    """
+
+    (layers, nodes, alpha), fold, iteration_max, batch_size, optimizer, schedule, seed = job
+    if seed is not None:
+        random.seed(seed)
+
+    # both sets are drawn from the shared examples by index, only a block at a time is copied
+    training_data = sampling.SampledBlocks(_dataset.x, _dataset.y,
+                                           sampling.Sampler(_dataset.y, rows=numpy.flatnonzero(_folds != fold)))
+    verification_data = sampling.SampledBlocks(_dataset.x, _dataset.y,
+                                               sampling.Sampler(_dataset.y, shuffle=False,
+                                                                rows=numpy.flatnonzero(_folds == fold)))
+
+    network = training.train(training_data, alpha, iteration_max, layers, nodes, batch_size=batch_size,
+                             optimizer=optimizer, schedule=schedule)
+
+    return (layers, nodes, alpha), fold, training.test(network, verification_data)
+
+
+def run_cross_validation(examples, grid, num_folds=5, time_blocked=False, iteration_max=20, batch_size=32,
+                         optimizer='adam', schedule='cosine', processes=None, seed=None):
+    """Function to cross validate every set of parameters, training the folds in a process pool.
+
+    Args:
+        examples: An ingest.SharedDataset, which the workers use without copying it, or a set or source of blocks of
+            examples to copy into one.
+        grid: A list of (layers, nodes, alpha) tuples to try.
+        num_folds: The number of folds.
+        time_blocked: Whether every fold is a contiguous run of examples instead of a random selection.
+        iteration_max: The maximum amount of iterations to train every network for.
+        batch_size: The number of examples to learn from per weight update.
+        optimizer: The name of the optimizer to train with (see optimizers.OPTIMIZERS), None for plain updates.
+        schedule: The name of the learning rate schedule (see optimizers.SCHEDULES), None to drop it linearly.
+        processes: The number of worker processes, defaults to the number of cores.
+        seed: The seed of the assignment to folds and of the first job (the rest count up from it), None to seed from
+            the random module.
+
+    Returns:
+        A list of the parameters with the mean and variance of their accuracy over the folds, best mean first.
+    """
+
+    if seed is None:
+        seed = random.getrandbits(32)
+
+    jobs = []
+    for parameters in grid:
+        for fold in range(num_folds):
+            jobs.append((parameters, fold, iteration_max, batch_size, optimizer, schedule, seed + len(jobs)))
+
+    accuracies = dict((parameters, []) for parameters in grid)
+
+    dataset = examples if isinstance(examples, ingest.SharedDataset) else ingest.share(examples)
+    try:
+        pool = ingest.create_pool(processes, init_worker, (dataset.descriptor(), num_folds, time_blocked, seed))
+        try:
+            # collect the results in the order they finish
+            for parameters, fold, accuracy in pool.imap_unordered(run_fold, jobs):
+                logging.info('Accuracy with {0} layer(s), {1} nodes per layer and alpha {2} on fold {3} was: '
+                             '{4:.4f}'.format(parameters[0], parameters[1], parameters[2], fold, accuracy))
+                accuracies[parameters].append(accuracy)
+        finally:
+            pool.close()
+            pool.join()
+    finally:
+        if dataset is not examples:
+            dataset.unlink()
+
+    # the variance is the unbiased estimate over the folds
+    results = [(parameters, float(numpy.mean(accuracies[parameters])),
+                float(numpy.var(accuracies[parameters], ddof=1)) if num_folds > 1 else 0.0) for parameters in grid]
+
+    return sorted(results, key=lambda result: -result[1])
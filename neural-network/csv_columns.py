@@ -0,0 +1,308 @@
+"""csv_columns.py: Fast reader for selected columns of large comma separated files."""
+
+__author__ = "Jordon Dornbos"
+
+import numpy
+
+# bytes read from the file at a time
+BLOCK_SIZE = 1 << 22
+
+NEWLINE = ord('\n')
+CARRIAGE_RETURN = ord('\r')
+COMMA = ord(',')
+
+
+def byte_blocks(filename, block_size=BLOCK_SIZE, start=None, end=None):
+    """Generator to read a file as large blocks of whole lines.
+
+    Args:
+        filename: The file to read.
+        block_size: The number of bytes to read at a time.
+        start: The byte offset of the first line to read, None to start after the header line.
+        end: The byte offset to stop reading at (the start of a line), None to read to the end of the file.
+
+    Yields:
+        The bytes of a block of lines, always ending with a newline.
+    """
+
+    with open(filename, 'rb') as file:
+        if start is None:
+            file.readline()     # skip the header
+        else:
+            file.seek(start)
+        remaining = end - file.tell() if end is not None else None
+
+        rest = b''
+        while remaining is None or remaining > 0:
+            data = file.read(block_size if remaining is None else min(block_size, remaining))
+            if not data:
+                break
+            if remaining is not None:
+                remaining -= len(data)
+
+            # hold back the partial line at the end for the next block
+            data = rest + data
+            cut = data.rfind(b'\n') + 1
+            rest = data[cut:]
+            if cut:
+                yield data[:cut]
+
+        if rest:
+            yield rest + b'\n'
+
+
+def line_bounds(array):
+    """Function to find every line in a block.
+
+    Args:
+        array: The bytes of the block as an array of uint8, ending with a newline.
+
+    Returns:
+        The offset of the first byte of every line and the offset just past its last byte (not counting the line
+        ending).
+    """
+
+    ends = numpy.flatnonzero(array == NEWLINE)
+    starts = numpy.empty_like(ends)
+    starts[0:1] = 0
+    starts[1:] = ends[:-1] + 1
+
+    # leave out the carriage return of windows line endings
+    ends -= (ends > starts) & (array[numpy.maximum(ends - 1, 0)] == CARRIAGE_RETURN)
+
+    return starts, ends
+
+
+def sampled_rows(count, first_row, stride=None, fraction=None, random=None):
+    """Function to choose which rows of a block to keep.
+
+    Args:
+        count: The number of rows in the block.
+        first_row: The number of rows in the file before the block.
+        stride: Keep only every stride-th row of the file (the stride-th, 2 * stride-th and so on), None for every row.
+        fraction: Keep every row with this probability, None for every row.
+        random: The numpy random generator to sample rows with.
+
+    Returns:
+        A boolean array marking the rows to keep, None to keep every row.
+    """
+
+    keep = None
+    if stride is not None:
+        keep = (numpy.arange(first_row + 1, first_row + count + 1) % stride) == 0
+    if fraction is not None:
+        chosen = random.random(count) < fraction
+        keep = chosen if keep is None else keep & chosen
+
+    return keep
+
+
+def field(array, starts, ends, first_comma, num_commas, commas, column):
+    """Function to cut one column out of every line in a block.
+
+    Args:
+        array: The bytes of the block as an array of uint8.
+        starts: The offset of the first byte of every line.
+        ends: The offset just past the last byte of every line.
+        first_comma: The index in commas of the first comma of every line.
+        num_commas: The number of commas in every line.
+        commas: The offsets of every comma in the block, followed by the length of the block.
+        column: The index of the column to cut out.
+
+    Returns:
+        An array of byte strings, empty for lines that do not have the column.
+    """
+
+    # commas ends with an extra offset past the block, so indices past the last comma of a line stay in bounds
+    last = len(commas) - 1
+    if column == 0:
+        field_starts = starts
+    else:
+        field_starts = commas[numpy.minimum(first_comma + column - 1, last)] + 1
+    field_ends = numpy.where(num_commas > column, commas[numpy.minimum(first_comma + column, last)], ends)
+    lengths = numpy.where(num_commas >= column, field_ends - field_starts, 0)
+
+    # copy every field into a row of a fixed width matrix, padded with zeros, and view the rows as strings
+    width = max(int(lengths.max()) if len(lengths) else 0, 1)
+    positions = numpy.arange(width)
+    characters = array.take(field_starts[:, None] + positions, mode='clip')
+    characters *= positions < lengths[:, None]
+
+    return characters.view('S{0}'.format(width)).ravel()
+
+
+def read_columns(filename, columns, block_size=BLOCK_SIZE, stride=None, fraction=None, seed=None, start=None,
+                 end=None):
+    """Generator to read selected columns of a file, a block of lines at a time.
+
+    Only the requested columns are cut out of the lines, all with whole array operations.
+
+    Args:
+        filename: The file to read.
+        columns: The indices of the columns to read.
+        block_size: The number of bytes to read at a time.
+        stride: Keep only every stride-th row of the file, None for every row.
+        fraction: Keep every row with this probability, None for every row.
+        seed: The seed of the random generator used with fraction.
+        start: The byte offset of the first line to read, None to start after the header line.
+        end: The byte offset to stop reading at (the start of a line), None to read to the end of the file.
+
+    Yields:
+        A list holding an array of byte strings for every requested column.
+    """
+
+    random = numpy.random.default_rng(seed) if fraction is not None else None
+    first_row = 0
+    for block in byte_blocks(filename, block_size, start, end):
+        array = numpy.frombuffer(block, dtype=numpy.uint8)
+        starts, ends = line_bounds(array)
+        keep = sampled_rows(len(starts), first_row, stride, fraction, random)
+        first_row += len(starts)
+
+        # leave out empty lines
+        keep = ends > starts if keep is None else keep & (ends > starts)
+        starts, ends = starts[keep], ends[keep]
+        if not len(starts):
+            continue
+
+        commas = numpy.append(numpy.flatnonzero(array == COMMA), len(array))
+        first_comma = numpy.searchsorted(commas, starts)
+        num_commas = numpy.searchsorted(commas, ends) - first_comma
+
+        yield [field(array, starts, ends, first_comma, num_commas, commas, column) for column in columns]
+
+
+def read_lines(filename, block_size=BLOCK_SIZE, stride=None, fraction=None, seed=None):
+    """Generator to read a sample of the lines of a file, header included.
+
+    Args:
+        filename: The file to read.
+        block_size: The number of bytes to read at a time.
+        stride: Keep only every stride-th row of the file after the header, None for every row.
+        fraction: Keep every row with this probability, None for every row.
+        seed: The seed of the random generator used with fraction.
+
+    Yields:
+        The bytes of the lines kept, starting with the header line.
+    """
+
+    with open(filename, 'rb') as file:
+        yield file.readline()
+
+    random = numpy.random.default_rng(seed) if fraction is not None else None
+    first_row = 0
+    for block in byte_blocks(filename, block_size):
+        array = numpy.frombuffer(block, dtype=numpy.uint8)
+        ends = numpy.flatnonzero(array == NEWLINE)
+        keep = sampled_rows(len(ends), first_row, stride, fraction, random)
+        first_row += len(ends)
+
+        if keep is None:
+            yield block
+            continue
+
+        # join the kept lines, newlines included
+        starts = numpy.concatenate(([0], ends[:-1] + 1))
+        yield b''.join(block[s:e + 1] for s, e in zip(starts[keep].tolist(), ends[keep].tolist()))
+
+
+def distinct(column):
+    """Function to find the distinct entries of a column.
+
+    Entries of up to 8 bytes are compared as integers, which sorts several times faster than byte strings.
+
+    Args:
+        column: An array of byte strings.
+
+    Returns:
+        A list of the distinct byte strings and an array with the index in that list of every entry.
+    """
+
+    if column.dtype.itemsize > 8:
+        values, inverse = numpy.unique(column, return_inverse=True)
+        return values.tolist(), inverse
+
+    codes, first, inverse = numpy.unique(pack(column), return_index=True, return_inverse=True)
+
+    return column[first].tolist(), inverse
+
+
+def pack(column):
+    """Function to turn byte strings of up to 8 bytes into integers, equal only if the strings are equal.
+
+    Args:
+        column: An array of byte strings, at most 8 bytes wide.
+
+    Returns:
+        An array of uint64 codes.
+    """
+
+    width = column.dtype.itemsize
+    padded = numpy.zeros((len(column), 8), dtype=numpy.uint8)
+    padded[:, :width] = column.view(numpy.uint8).reshape(len(column), width)
+
+    return padded.view(numpy.uint64).ravel()
+
+
+def to_float(column):
+    """Function to convert a column of byte strings to floats.
+
+    Args:
+        column: An array of byte strings.
+
+    Returns:
+        An array of floats, NaN where a value is not a number.
+    """
+
+    values, integers = parse_integers(column)
+    if integers.all():
+        return values
+
+    # convert every distinct other value on its own, most columns only hold a few
+    others = column[~integers]
+    distinct_values, inverse = distinct(others)
+    values[~integers] = numpy.array([parse_float(value) for value in distinct_values], dtype=numpy.float64)[inverse]
+    return values
+
+
+def parse_integers(column):
+    """Function to convert the entries of a column that are whole numbers, a digit position at a time.
+
+    Args:
+        column: An array of byte strings.
+
+    Returns:
+        An array of floats and a boolean array marking the entries that were whole numbers.
+    """
+
+    width = column.dtype.itemsize
+    characters = column.view(numpy.uint8).reshape(len(column), width)
+    lengths = numpy.count_nonzero(characters, axis=1)
+    negative = characters[:, 0] == ord('-')
+
+    values = numpy.zeros(len(column))
+    integers = lengths > negative
+    for position in range(width):
+        digits = characters[:, position].astype(numpy.int64) - ord('0')
+        present = (position < lengths) & ~(negative & (position == 0))
+        integers &= ~present | ((digits >= 0) & (digits <= 9))
+        values = numpy.where(present, values * 10 + digits, values)
+
+    values[negative] *= -1
+    return values, integers
+
+
+def parse_float(value):
+    """Function to convert a byte string to a float.
+
+    Args:
+        value: The byte string.
+
+    Returns:
+        The float, NaN if the value is not a number.
+    """
+
+    try:
+        return float(value)
+    except ValueError:
+        return float('nan')
@@ -0,0 +1,253 @@
+"""encoding.py: Compiled indexes turning raw flight data columns into normalized delay rates."""
+
+__author__ = "Jordon Dornbos"
+
+import numpy
+import csv_columns
+
+# ways of encoding a value missing from the normalized data: leave out the row, use the delay rate of every flight in
+# the table, or give a number to use instead
+UNKNOWN_VALUES = ('drop', 'mean')
+
+# departure times are written as hhmm, so every time fits in four digits
+TIME_LIMIT = 10000
+
+# upper bounds of the distance ranges in the normalized data, the last range has no bound
+DISTANCE_BOUNDS = [300.0, 600.0, 900.0]
+
+
+def time_bucket(time):
+    """Function to find the bucket of a departure time in the normalized data, the same for the tables and the inputs.
+
+    Args:
+        time: The departure time as written in the flight data (such as '1542' or b'25'), or as a number.
+
+    Returns:
+        The hour as a string (times before 100 are in hour '0'), None if the time is not a whole number.
+    """
+
+    try:
+        return str(int(time) // 100)
+    except ValueError:
+        return None
+
+
+def unknown_rate(map, unknown):
+    """Function to find the delay rate used for values missing from a normalized data map.
+
+    Args:
+        map: A map from a value to its total flights, delayed flights and rate.
+        unknown: Either 'drop', 'mean' or the rate to use.
+
+    Returns:
+        The rate, NaN to leave out rows with missing values.
+    """
+
+    if unknown == 'drop':
+        return float('nan')
+    if unknown == 'mean':
+        total = sum(float(values[0]) for values in map.values())
+        return sum(float(values[1]) for values in map.values()) / total if total else float('nan')
+
+    return float(unknown)
+
+
+class CategoryIndex(object):
+
+    def __init__(self, map, unknown='drop'):
+        # every key gets a dense ID, the last ID stands for keys missing from the map
+        self.keys = sorted(map)
+        self.ids = dict((key, i) for i, key in enumerate(self.keys))
+        self.unknown_id = len(self.keys)
+        self.rates = numpy.array([float(map[key][2]) for key in self.keys] + [unknown_rate(map, unknown)])
+
+        # keys of up to 8 bytes are also kept as sorted integer codes, so a column is encoded with one search
+        encoded = [key.encode('utf-8') for key in self.keys]
+        self.codes = None
+        if all(len(key) <= 8 for key in encoded):
+            codes = csv_columns.pack(numpy.array(encoded, dtype='S8')) if encoded else numpy.zeros(0, numpy.uint64)
+            self.order = numpy.argsort(codes)
+            self.codes = codes[self.order]
+
+    def encode(self, column):
+        """Method to find the ID of every entry of a column.
+
+        Args:
+            column: An array of byte strings.
+
+        Returns:
+            An array of IDs, unknown_id where the entry is not a key.
+        """
+
+        if self.codes is None or column.dtype.itemsize > 8 or not len(self.codes):
+            values, inverse = csv_columns.distinct(column)
+            return numpy.array([self.lookup(value.decode('utf-8', 'replace')) for value in values],
+                               dtype=numpy.intp)[inverse]
+
+        codes = csv_columns.pack(column)
+        positions = numpy.minimum(numpy.searchsorted(self.codes, codes), len(self.codes) - 1)
+        return numpy.where(self.codes[positions] == codes, self.order[positions], self.unknown_id)
+
+    def lookup(self, key):
+        """Method to find the ID of a single key.
+
+        Args:
+            key: The key as a string.
+
+        Returns:
+            The ID, unknown_id if it is not a key.
+        """
+
+        return self.ids.get(key, self.unknown_id)
+
+    def rate(self, column):
+        """Method to find the delay rate of every entry of a column.
+
+        Args:
+            column: An array of byte strings.
+
+        Returns:
+            An array of rates.
+        """
+
+        return self.rates[self.encode(column)]
+
+
+class TimeIndex(object):
+
+    def __init__(self, map, unknown='drop'):
+        # the rate of every departure time, looked up by its hour (see time_bucket), the last entry stands for times
+        # that are not in the map or not a whole number
+        fallback = unknown_rate(map, unknown)
+        rates = dict((key, float(values[2])) for key, values in map.items())
+        self.unknown_id = TIME_LIMIT
+        self.rates = numpy.array([rates.get(time_bucket(time), fallback) for time in range(TIME_LIMIT)] + [fallback])
+
+    def encode(self, column):
+        """Method to find the ID of every departure time in a column.
+
+        Args:
+            column: An array of byte strings holding departure times.
+
+        Returns:
+            An array of IDs (the times themselves), unknown_id where the time is not a whole number in range.
+        """
+
+        times = csv_columns.to_float(column)
+        valid = (times >= 0) & (times < TIME_LIMIT) & (times == numpy.floor(times))
+        return numpy.where(valid, numpy.nan_to_num(times), self.unknown_id).astype(numpy.intp)
+
+    def lookup(self, time):
+        """Method to find the ID of a single departure time.
+
+        Args:
+            time: The departure time as a string.
+
+        Returns:
+            The ID, unknown_id if the time is not a whole number in range.
+        """
+
+        try:
+            time = int(time)
+        except ValueError:
+            return self.unknown_id
+
+        return time if 0 <= time < TIME_LIMIT else self.unknown_id
+
+    def rate(self, column):
+        """Method to find the delay rate of every departure time in a column.
+
+        Args:
+            column: An array of byte strings holding departure times.
+
+        Returns:
+            An array of rates.
+        """
+
+        return self.rates[self.encode(column)]
+
+
+class DistanceIndex(object):
+
+    def __init__(self, map, unknown='drop'):
+        # the rate of every distance range, then the rate of distances that are not a number, ranges missing from the
+        # map (a table generated from a file without flights that long) get the fallback rate
+        fallback = unknown_rate(map, unknown)
+        self.unknown_id = len(DISTANCE_BOUNDS) + 1
+        self.rates = numpy.array([float(map[str(i)][2]) if str(i) in map else fallback
+                                  for i in range(self.unknown_id)] + [fallback])
+
+    def encode(self, distances):
+        """Method to find the ID of the range of every distance.
+
+        Args:
+            distances: An array of distances in miles, NaN where the distance is not a number.
+
+        Returns:
+            An array of IDs.
+        """
+
+        ids = numpy.searchsorted(DISTANCE_BOUNDS, distances, side='right')
+        ids[numpy.isnan(distances)] = self.unknown_id
+        return ids
+
+    def rate(self, distances):
+        """Method to find the delay rate of the range of every distance.
+
+        Args:
+            distances: An array of distances in miles, NaN where the distance is not a number.
+
+        Returns:
+            An array of rates.
+        """
+
+        return self.rates[self.encode(distances)]
+
+
+class FlightEncoding(object):
+
+    def __init__(self, normalized_data, unknown='drop'):
+        if unknown not in UNKNOWN_VALUES and not isinstance(unknown, (int, float)):
+            raise ValueError('Unknown fallback {0}, expected one of {1} or a number'.format(unknown, UNKNOWN_VALUES))
+
+        self.unknown = unknown
+        self.time = TimeIndex(normalized_data[0], unknown)
+        self.distance = DistanceIndex(normalized_data[1], unknown)
+        self.carrier = CategoryIndex(normalized_data[2], unknown)
+        self.airport = CategoryIndex(normalized_data[3], unknown)
+
+    def encode(self, times, carriers, airports, distances):
+        """Method to turn columns of flight data into the inputs of the network.
+
+        Args:
+            times: An array of byte strings holding departure times.
+            carriers: An array of byte strings holding carrier codes.
+            airports: An array of byte strings holding origin airport codes.
+            distances: An array of distances in miles.
+
+        Returns:
+            A matrix with the normalized departure time, carrier, airport and distance of every flight, NaN where a
+            value was missing and the fallback is 'drop'.
+        """
+
+        return numpy.column_stack((self.time.rate(times), self.carrier.rate(carriers), self.airport.rate(airports),
+                                   self.distance.rate(distances)))
+
+    def encode_one(self, departure_time, carrier, origin, distance):
+        """Method to turn the fields of a single flight into the inputs of the network.
+
+        Args:
+            departure_time: The departure time as written in the flight data (such as '1542').
+            carrier: The carrier code.
+            origin: The origin airport code.
+            distance: The distance in miles.
+
+        Returns:
+            A list of the normalized departure time, carrier, airport and distance, NaN where a value was missing and
+            the fallback is 'drop'.
+        """
+
+        return [float(self.time.rates[self.time.lookup(str(departure_time))]),
+                float(self.carrier.rates[self.carrier.lookup(carrier)]),
+                float(self.airport.rates[self.airport.lookup(origin)]),
+                float(self.distance.rate(numpy.array([float(distance)]))[0])]
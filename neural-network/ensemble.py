@@ -0,0 +1,230 @@
+"""ensemble.py: Bagged ensembles of networks, trained in a process pool and guessed with stacked weight matrices."""
+
+__author__ = "Jordon Dornbos"
+
+import random
+import numpy
+import ingest
+import multilayer_network
+import sampling
+import training
+import vectorized
+
+# the number of inputs guessed at a time, small enough that the outputs of every member stay in the cache
+BLOCK_ROWS = 2048
+
+# the shared data set attached once in every worker process
+_dataset = None
+
+
+def bootstrap_rows(rows, seed):
+    """Function to draw a bootstrap sample of example indices.
+
+    Args:
+        rows: The number of examples.
+        seed: The seed of the random generator.
+
+    Returns:
+        An array of row indices drawn with replacement, so about a third of the examples are left out and others
+        appear more than once.
+    """
+
+    return numpy.random.default_rng(seed).integers(0, rows, rows)
+
+
+def init_worker(descriptor):
+    """Function to attach a worker process to the shared data set.
+
+    Args:
+        descriptor: The descriptor of the shared data set.
+    """
+
+    global _dataset
+    _dataset = ingest.SharedDataset.attach(descriptor)
+
+
+def train_member(job):
+    """Function to train one member of the ensemble on its own bootstrap sample.
+
+    Args:
+        job: A tuple of the number of hidden layers, the number of nodes per hidden layer, the learning rate, the
+            maximum amount of iterations, the batch size, the names of the optimizer and schedule, the balance and the
+            seed of the member.
+
+    Returns:
+        The seed and the weights learned.
+    """
+
+    layers, nodes, alpha, iteration_max, batch_size, optimizer, schedule, balance, seed = job
+
+    # the seed picks the initial weights as well as the sample and order of the examples
+    random.seed(seed)
+    rows = bootstrap_rows(_dataset.rows, seed)
+    examples = sampling.SampledBlocks(_dataset.x, _dataset.y,
+                                      sampling.Sampler(_dataset.y, balance=balance, seed=seed, rows=rows))
+
+    hypothesis = training.train(examples, alpha, iteration_max, layers, nodes, batch_size=batch_size,
+                                optimizer=optimizer, schedule=schedule)
+
+    return seed, hypothesis.network.copy_weights()
+
+
+class EnsembleHypothesis(object):
+
+    def __init__(self, networks):
+        first = networks[0]
+        for network in networks:
+            if network.layer_sizes != first.layer_sizes or network.activation != first.activation:
+                raise ValueError('Every network of an ensemble needs the same layers and activation')
+
+        self.networks = networks
+        self.activation = vectorized.ACTIVATIONS[first.activation]
+
+        # the first layer of every member sees the same inputs, so their weights are put side by side and computed by
+        # one matrix product, the deeper layers are stacked along a new first axis and computed by one batched product
+        matrices = list(zip(*[vectorized.layer_matrices(network) for network in networks]))
+        self.first_weights = numpy.concatenate([matrix[:, :-1].T for matrix in matrices[0]], axis=1)
+        self.first_biases = numpy.concatenate([matrix[:, -1] for matrix in matrices[0]])
+        self.weights = []   # per deeper layer, (members, inputs, nodes)
+        self.biases = []    # per deeper layer, (members, 1, nodes)
+        for layer in matrices[1:]:
+            stacked = numpy.stack(layer)
+            self.weights.append(numpy.ascontiguousarray(stacked[:, :, :-1].transpose(0, 2, 1)))
+            self.biases.append(stacked[:, None, :, -1].copy())
+
+    def guess(self, input):
+        """Guess method for the ensemble.
+
+        Args:
+            input: The input to run though the networks.
+
+        Returns:
+            The mean confidence of the networks in the input being in the function.
+        """
+
+        return self.guess_batch(input).tolist()
+
+    def guess_batch(self, inputs):
+        """Guess method for many inputs at once, running every member in the same pass.
+
+        Args:
+            inputs: A matrix with one input per row (or a single input vector).
+
+        Returns:
+            A matrix with the mean confidence of the networks in every input being in the function, one row per input.
+        """
+
+        inputs = numpy.asarray(inputs, numpy.float64)
+        if inputs.ndim == 1:
+            return self.guess_batch(inputs[None, :])[0]
+
+        num_members = len(self.networks)
+        guesses = numpy.empty((len(inputs), self.networks[0].num_output_nodes))
+        for start in range(0, len(inputs), BLOCK_ROWS):
+            block = inputs[start:start + BLOCK_ROWS]
+
+            # (rows, members * nodes) to (members, rows, nodes)
+            output = self.activation(numpy.dot(block, self.first_weights) + self.first_biases)
+            output = output.reshape(len(block), num_members, -1).transpose(1, 0, 2)
+            for weights, biases in zip(self.weights, self.biases):
+                output = self.activation(numpy.matmul(output, weights) + biases)
+
+            guesses[start:start + len(block)] = output.mean(axis=0)
+
+        return guesses
+
+    def predict(self, inputs, threshold=0.5):
+        """Method to decide for many inputs at once whether they are in the function.
+
+        Args:
+            inputs: A matrix with one input per row.
+            threshold: The mean confidence above which an input counts as being in the function.
+
+        Returns:
+            A matrix of 1.0 for inputs in the function and 0.0 otherwise, one row per input.
+        """
+
+        return (self.guess_batch(inputs) > threshold).astype(numpy.float64)
+
+
+def train_ensemble(examples, num_members, num_hidden_layers, num_nodes_per_hidden_layer, alpha=0.01, iteration_max=20,
+                   batch_size=32, optimizer='adam', schedule='cosine', balance='interleave', processes=None, seed=None):
+    """Function to train networks on bootstrap samples of the examples in a process pool and put them together.
+
+    Args:
+        examples: An ingest.SharedDataset, which the workers use without copying it, or a set or source of blocks of
+            examples to copy into one.
+        num_members: The number of networks in the ensemble.
+        num_hidden_layers: The number of hidden layers of every network.
+        num_nodes_per_hidden_layer: The number of nodes per hidden layer of every network.
+        alpha: The learning rate.
+        iteration_max: The maximum amount of iterations to train every network for.
+        batch_size: The number of examples to learn from per weight update.
+        optimizer: The name of the optimizer to train with (see optimizers.OPTIMIZERS), None for plain updates.
+        schedule: The name of the learning rate schedule (see optimizers.SCHEDULES), None to drop it linearly.
+        balance: How to balance delayed and on time examples, see sampling.Sampler.
+        processes: The number of worker processes, defaults to the number of cores.
+        seed: The seed of the first member (the rest count up from it), None to seed from the random module.
+
+    Returns:
+        The ensemble hypothesis.
+    """
+
+    if seed is None:
+        seed = random.getrandbits(32)
+
+    jobs = [(num_hidden_layers, num_nodes_per_hidden_layer, alpha, iteration_max, batch_size, optimizer, schedule,
+             balance, seed + m) for m in range(num_members)]
+
+    dataset = examples if isinstance(examples, ingest.SharedDataset) else ingest.share(examples)
+    try:
+        num_inputs, num_outputs = dataset.num_inputs, dataset.num_outputs
+        pool = ingest.create_pool(processes, init_worker, (dataset.descriptor(),))
+        try:
+            # keep the members in seed order, whichever finishes first
+            members = sorted(pool.imap_unordered(train_member, jobs), key=lambda member: member[0])
+        finally:
+            pool.close()
+            pool.join()
+    finally:
+        if dataset is not examples:
+            dataset.unlink()
+
+    networks = [multilayer_network.MultilayerNetwork(num_inputs, num_hidden_layers, num_nodes_per_hidden_layer,
+                                                     num_outputs, weights=weights) for member_seed, weights in members]
+
+    return EnsembleHypothesis(networks)
+
+
+def save(filename, ensemble):
+    """Function to write the networks of an ensemble to a file.
+
+    Args:
+        filename: The file to write, numpy adds .npz if it has no extension.
+        ensemble: The ensemble hypothesis.
+    """
+
+    first = ensemble.networks[0]
+    numpy.savez(filename, weights=numpy.stack([network.weights for network in ensemble.networks]),
+                shape=numpy.array([first.num_input_nodes, first.num_hidden_layers, first.num_nodes_per_hidden_layer,
+                                   first.num_output_nodes]),
+                activation=numpy.array(first.activation))
+
+
+def load(filename):
+    """Function to read an ensemble written by save.
+
+    Args:
+        filename: The file to read.
+
+    Returns:
+        The ensemble hypothesis.
+    """
+
+    with numpy.load(filename) as arrays:
+        weights = arrays['weights']
+        shape = [int(size) for size in arrays['shape']]
+        activation = str(arrays['activation'])
+
+    return EnsembleHypothesis([multilayer_network.MultilayerNetwork(*shape, activation=activation, weights=row.copy())
+                               for row in weights])
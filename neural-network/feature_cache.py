@@ -0,0 +1,137 @@
+"""feature_cache.py: Binary cache of normalized flight data."""
+
+__author__ = "Jordon Dornbos"
+
+import hashlib
+import json
+import logging
+import os
+import numpy
+import flight_data
+import vectorized
+
+CACHE_DIRECTORY = '.feature-cache'
+CACHE_DTYPE = numpy.float64
+
+
+def file_signature(filename):
+    """Function to describe the version of a file on disk.
+
+    Args:
+        filename: The file to describe.
+
+    Returns:
+        A string with the absolute path, modification time and size of the file.
+    """
+
+    stat = os.stat(filename)
+    return '{0}:{1}:{2}'.format(os.path.abspath(filename), stat.st_mtime_ns, stat.st_size)
+
+
+def cache_key(filename, normalized_filename, unknown='drop'):
+    """Function to compute the cache key of a flight data file normalized with a certain table.
+
+    Args:
+        filename: The flight data file.
+        normalized_filename: The normalized data file used to encode the flight data.
+        unknown: How values missing from the normalized data are encoded, see encoding.FlightEncoding.
+
+    Returns:
+        A hex digest that changes whenever either file or the encoding of missing values changes.
+    """
+
+    signature = file_signature(filename) + '|' + file_signature(normalized_filename)
+    if unknown != 'drop':
+        signature += '|unknown={0!r}'.format(unknown)
+    return hashlib.sha1(signature.encode('utf-8')).hexdigest()
+
+
+def write_cache(data_path, blocks):
+    """Function to write blocks of inputs and outputs to a cache file.
+
+    Every row of the file holds the inputs followed by the outputs of one example.
+
+    Args:
+        data_path: The cache file to write.
+        blocks: An iterable of (inputs, outputs) matrices.
+
+    Returns:
+        The number of rows, inputs and outputs written.
+    """
+
+    rows = 0
+    num_inputs = num_outputs = 0
+    with open(data_path, 'wb') as file:
+        for x, y in blocks:
+            numpy.hstack((x, y)).astype(CACHE_DTYPE).tofile(file)
+            rows += len(x)
+            num_inputs, num_outputs = x.shape[1], y.shape[1]
+
+    return rows, num_inputs, num_outputs
+
+
+def open_cache(data_path, rows, num_inputs, num_outputs, block_size=None):
+    """Function to map a cache file into memory without copying it.
+
+    Args:
+        data_path: The cache file to open.
+        rows: The number of rows in the file.
+        num_inputs: The number of inputs per row.
+        num_outputs: The number of outputs per row.
+        block_size: The number of rows per block, None for a single block.
+
+    Returns:
+        A source of blocks of examples, whose inputs and outputs are views of the mapped file.
+    """
+
+    if rows == 0:
+        data = numpy.zeros((0, num_inputs + num_outputs), dtype=CACHE_DTYPE)
+    else:
+        data = numpy.memmap(data_path, dtype=CACHE_DTYPE, mode='r', shape=(rows, num_inputs + num_outputs))
+
+    return vectorized.ArrayBlocks(data[:, :num_inputs], data[:, num_inputs:], block_size)
+
+
+def load(filename, normalized_filename, cache_directory=CACHE_DIRECTORY, block_size=None, unknown='drop'):
+    """Function to load normalized flight data, parsing the files only if they are not already cached.
+
+    Args:
+        filename: The flight data file.
+        normalized_filename: The normalized data file used to encode the flight data.
+        cache_directory: The directory holding the cache files.
+        block_size: The number of rows per block returned, None for a single block.
+        unknown: How to encode values missing from the normalized data, see encoding.FlightEncoding.
+
+    Returns:
+        A source of blocks of examples, whose inputs and outputs are views of the mapped cache file.
+    """
+
+    key = cache_key(filename, normalized_filename, unknown)
+    data_path = os.path.join(cache_directory, key + '.bin')
+    meta_path = os.path.join(cache_directory, key + '.json')
+
+    # the metadata is written last, so the cache is complete if it exists
+    if os.path.exists(meta_path):
+        logging.info('Loading cached features for {0}'.format(filename))
+        with open(meta_path) as file:
+            meta = json.load(file)
+        return open_cache(data_path, meta['rows'], meta['inputs'], meta['outputs'], block_size)
+
+    logging.info('Caching features for {0}'.format(filename))
+    os.makedirs(cache_directory, exist_ok=True)
+
+    # write to temporary files first so a crash never leaves a cache entry behind, named per process so processes
+    # caching the same file at once do not write over each other
+    temporary_suffix = '.{0}.tmp'.format(os.getpid())
+    normalized_data = flight_data.get_normalized_data(normalized_filename)
+    rows, num_inputs, num_outputs = write_cache(data_path + temporary_suffix,
+                                                flight_data.read_blocks(filename, normalized_data, unknown=unknown))
+    os.replace(data_path + temporary_suffix, data_path)
+
+    meta = {'source': os.path.abspath(filename), 'normalized': os.path.abspath(normalized_filename), 'rows': rows,
+            'inputs': num_inputs, 'outputs': num_outputs}
+    with open(meta_path + temporary_suffix, 'w') as file:
+        json.dump(meta, file)
+    os.replace(meta_path + temporary_suffix, meta_path)
+
+    return open_cache(data_path, rows, num_inputs, num_outputs, block_size)
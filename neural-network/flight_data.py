@@ -0,0 +1,150 @@
+"""flight_data.py: Streaming loader for flight data files."""
+
+__author__ = "Jordon Dornbos"
+
+import logging
+import numpy
+import csv_columns
+import encoding
+import example
+
+# columns of the flight data files used as inputs and outputs
+TIME_COLUMN = 5
+CARRIER_COLUMN = 8
+DELAY_COLUMN = 15
+AIRPORT_COLUMN = 16
+DISTANCE_COLUMN = 18
+CANCELLED_COLUMN = 21
+
+# flights delayed by more than this many minutes count as delayed
+DELAY_THRESHOLD = 15.0
+
+
+def build_map(file, break_word=None):
+    """Function to read one table of the normalized data into a map.
+
+    Args:
+        file: The open normalized data file, positioned at the first line of the table.
+        break_word: A word on the header line of the next table, None to read to the end of the file.
+
+    Returns:
+        A map from a value to its total flights, delayed flights and rate (as strings).
+    """
+
+    map = {}
+
+    # put data in maps
+    for line in file:
+        if break_word is not None and break_word in line:
+            break
+
+        values = line.rstrip('\n').split(',')  # split the data up
+
+        # map[value] = Total Flights, Delayed Flights, Rate (the message is only formatted if debug logging is on)
+        logging.debug('Putting [%s = %s, %s, %s] into the map', values[0], values[1], values[2], values[3])
+        map[values[0]] = [values[1], values[2], values[3]]
+
+    return map
+
+
+def get_normalized_data(filename):
+    """Function to read the normalized data file written by normalize.py.
+
+    Args:
+        filename: The normalized data file.
+
+    Returns:
+        A list of the time, distance, carrier and airport maps.
+    """
+
+    with open(filename) as file:
+        # skip the time header
+        next(file)
+
+        # put normalized data in maps
+        logging.debug('Getting normalized time data')
+        time = build_map(file, 'distance')
+        logging.debug('Getting normalized distance data')
+        distance = build_map(file, 'carrier')
+        logging.debug('Getting normalized carrier data')
+        carrier = build_map(file, 'airports')
+        logging.debug('Getting normalized airport data')
+        airports = build_map(file)
+
+    return [time, distance, carrier, airports]
+
+
+def read_blocks(filename, normalized_data, block_size=csv_columns.BLOCK_SIZE, unknown='drop'):
+    """Generator to read a flight data file as blocks of inputs and outputs.
+
+    Canceled flights and rows with invalid values are skipped, and the inputs are normalized with the delay rates of the
+    normalized data.
+
+    Args:
+        filename: The flight data file to read.
+        normalized_data: The time, distance, carrier and airport maps from get_normalized_data.
+        block_size: The number of bytes to read per block.
+        unknown: How to encode values missing from the normalized data, see encoding.FlightEncoding.
+
+    Yields:
+        A matrix with one input vector per row and a matrix with one output vector per row.
+    """
+
+    flight_encoding = encoding.FlightEncoding(normalized_data, unknown)
+
+    columns = [TIME_COLUMN, CARRIER_COLUMN, AIRPORT_COLUMN, DISTANCE_COLUMN, DELAY_COLUMN, CANCELLED_COLUMN]
+    for times, carriers, airports, distances, delays, cancelled in csv_columns.read_columns(filename, columns,
+                                                                                            block_size):
+        x = flight_encoding.encode(times, carriers, airports, csv_columns.to_float(distances))
+        delays = csv_columns.to_float(delays)
+
+        # only consider flights that haven't been canceled, with every value found
+        cancelled = csv_columns.to_float(cancelled)
+        rows = (cancelled == cancelled) & (cancelled != 1.0) & ~numpy.isnan(delays) & ~numpy.isnan(x).any(axis=1)
+        if not rows.any():
+            continue
+
+        # apply the delay threshold
+        yield x[rows], (delays[rows, None] > DELAY_THRESHOLD).astype(numpy.float64)
+
+
+def get_data(filename, time_map, distance_map, carrier_map, airport_map, unknown='drop'):
+    """Function to read a flight data file into a list of examples.
+
+    Args:
+        filename: The flight data file to read.
+        time_map: The normalized departure time map.
+        distance_map: The normalized distance map.
+        carrier_map: The normalized carrier map.
+        airport_map: The normalized airport map.
+        unknown: How to encode values missing from the maps, see encoding.FlightEncoding.
+
+    Returns:
+        A list of examples, each with input vector x and output vector y.
+    """
+
+    # read the flight data in large blocks, only converting the columns used (rows with values missing from the maps
+    # are left out, unless unknown gives a fallback)
+    data = []
+    for x, y in read_blocks(filename, [time_map, distance_map, carrier_map, airport_map], unknown=unknown):
+        data.extend(example.Example(inputs, outputs) for inputs, outputs in zip(x.tolist(), y.tolist()))
+
+    return data
+
+
+class FlightData(object):
+
+    def __init__(self, filename, normalized_data, block_size=csv_columns.BLOCK_SIZE, unknown='drop'):
+        self.filename = filename
+        self.normalized_data = normalized_data
+        self.block_size = block_size
+        self.unknown = unknown
+
+    def blocks(self):
+        """Method to read through the flight data file from the start.
+
+        Returns:
+            A generator of blocks of inputs and outputs, see read_blocks.
+        """
+
+        return read_blocks(self.filename, self.normalized_data, self.block_size, self.unknown)
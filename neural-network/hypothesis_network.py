@@ -3,30 +3,66 @@
 __author__ = "Jordon Dornbos"
 
 import back_prop_learning
+import numpy
+import vectorized
 
 
 class HypothesisNetwork(object):
 
-    def __init__(self, network):
+    def __init__(self, network, engine='matrix', epochs=None):
         self.network = network
+        self.engine = engine
+        self.epochs = epochs    # the number of iterations the network was trained for
 
-    def guess(self, input):
+    def guess(self, input, engine=None):
         """Guess method for the hypothesis network.
 
         Args:
             input: The input to run though the network.
+            engine: Either 'node' or 'matrix', defaults to the engine the network was created with.
 
         Returns:
             The confidence of the input being in the function.
         """
 
+        if engine is None:
+            engine = self.engine
+
+        if engine == 'matrix':
+            return self.guess_batch(input).tolist()
+
         # load in the input and propagate it thought the network
         back_prop_learning.load_and_feed(input, self.network)
         output_layer = self.network.output_layer
 
         # put the output in an array (in case the output is multi-dimensional)
-        output = []
-        for i in range(output_layer.num_nodes):
-            output.append(output_layer.nodes[i].output)
+        return output_layer.outputs.tolist()
+
+    def guess_batch(self, inputs):
+        """Guess method for many inputs at once.
+
+        The inputs are run through the weight matrices of the network without touching the state of its nodes, so it is
+        safe to call while other guesses are being made.
+
+        Args:
+            inputs: A matrix with one input per row (or a single input vector).
+
+        Returns:
+            A matrix with the confidence of every input being in the function, one row per input.
+        """
+
+        return vectorized.feed_forward(vectorized.layer_matrices(self.network), numpy.asarray(inputs, numpy.float64),
+                                       vectorized.ACTIVATIONS[self.network.activation])[-1]
+
+    def predict(self, inputs, threshold=0.5):
+        """Method to decide for many inputs at once whether they are in the function.
+
+        Args:
+            inputs: A matrix with one input per row.
+            threshold: The confidence above which an input counts as being in the function.
+
+        Returns:
+            A matrix of 1.0 for inputs in the function and 0.0 otherwise, one row per input.
+        """
 
-        return output
+        return (self.guess_batch(inputs) > threshold).astype(numpy.float64)
@@ -0,0 +1,148 @@
+"""incremental.py: Warm-start retraining of a trained network on newly arrived flight data.
+
+Usage:
+    python incremental.py <checkpoint file> <new flight data file> <normalized data file>
+        <verification flight data file> <verification normalized data file>
+        [<old flight data file> <old normalized data file>]
+
+The network in the checkpoint is trained for a few iterations on the new flights, mixed with a sample of the old
+flights if given (encoded with the normalized data of their own year), and the checkpoint is only replaced if the
+accuracy on the verification flights does not drop.
+"""
+
+__author__ = "Jordon Dornbos"
+
+import logging
+import random
+import sys
+import numpy
+import back_prop_learning
+import checkpoint
+import feature_cache
+import multilayer_network
+import optimizers
+import sampling
+import training
+import vectorized
+
+
+def replay_sample(examples, size, seed=None):
+    """Function to draw a uniform random sample of old examples, holding at most one block more than the sample.
+
+    Every example gets a random key and the examples with the smallest keys are kept, so any number of blocks can be
+    sampled from in a single pass.
+
+    Args:
+        examples: A set of examples, each with input vector x and output vector y, or a source of blocks of examples.
+        size: The number of examples to keep.
+        seed: The seed of the random generator, None to seed it from the random module.
+
+    Returns:
+        A source of blocks holding the sampled examples, None if there were none.
+    """
+
+    generator = numpy.random.default_rng(seed if seed is not None else random.getrandbits(32))
+    keys = x = y = None
+    for block_x, block_y in vectorized.as_blocks(examples).blocks():
+        block_keys = generator.random(len(block_x))
+        if len(block_keys) > size:
+            # only the smallest keys of a block can make it into the sample
+            kept = numpy.argpartition(block_keys, size)[:size]
+            block_keys, block_x, block_y = block_keys[kept], block_x[kept], block_y[kept]
+
+        if keys is None:
+            keys, x, y = block_keys, numpy.array(block_x), numpy.array(block_y)
+        else:
+            keys = numpy.concatenate((keys, block_keys))
+            x = numpy.concatenate((x, block_x))
+            y = numpy.concatenate((y, block_y))
+
+        if len(keys) > size:
+            kept = numpy.argpartition(keys, size)[:size]
+            keys, x, y = keys[kept], x[kept], y[kept]
+
+    if keys is None or not len(keys):
+        return None
+
+    return vectorized.ArrayBlocks(x, y)
+
+
+def retrain(hypothesis, new_examples, verification_data, replay_examples=None, replay_size=10000, alpha=0.003,
+            iteration_max=5, batch_size=32, optimizer='adam', schedule='cosine', balance='interleave', tolerance=0.0,
+            seed=None):
+    """Function to continue training a network on new examples, keeping the new weights only if they are as accurate.
+
+    The schedule is short and starts from a low learning rate, so the network adjusts to the new examples without
+    forgetting what it learned before.
+
+    Args:
+        hypothesis: The hypothesis network trained before.
+        new_examples: The newly arrived examples, as a set of examples or a source of blocks of examples.
+        verification_data: The examples to compare the accuracy of the old and new weights on.
+        replay_examples: The examples the network was trained on before, None to only train on the new examples.
+        replay_size: The number of old examples to mix in with the new ones.
+        alpha: The learning rate.
+        iteration_max: The number of passes over the new and replayed examples.
+        batch_size: The number of examples to learn from per weight update.
+        optimizer: The name of the optimizer to train with (see optimizers.OPTIMIZERS), None for plain updates.
+        schedule: The name of the learning rate schedule (see optimizers.SCHEDULES), None to drop it linearly.
+        balance: How to balance delayed and on time examples, see sampling.Sampler.
+        tolerance: How much lower the accuracy of the new weights may be and still be accepted.
+        seed: The seed of the replay sample and the order of the examples, None to seed from the random module.
+
+    Returns:
+        The hypothesis network to use from now on, its accuracy on the verification data and whether it was retrained.
+    """
+
+    previous_accuracy = training.test(hypothesis, verification_data)
+
+    # put the new examples and the replayed old examples together
+    blocks = list(vectorized.as_blocks(new_examples).blocks())
+    if replay_examples is not None:
+        replayed = replay_sample(replay_examples, replay_size, seed)
+        if replayed is not None:
+            blocks.extend(replayed.blocks())
+    x = numpy.concatenate([block_x for block_x, block_y in blocks])
+    y = numpy.concatenate([block_y for block_x, block_y in blocks])
+    logging.info('Retraining on {0} examples'.format(len(x)))
+
+    # train a copy of the network, so the previous one is untouched if the new weights are rejected
+    previous = hypothesis.network
+    network = multilayer_network.MultilayerNetwork(previous.num_input_nodes, previous.num_hidden_layers,
+                                                   previous.num_nodes_per_hidden_layer, previous.num_output_nodes,
+                                                   previous.activation)
+    examples = sampling.SampledBlocks(x, y, sampling.Sampler(y, balance=balance, seed=seed))
+    candidate = back_prop_learning.back_prop_learning(
+        examples, network, alpha=alpha, iteration_max=iteration_max, weights=previous.weights, batch_size=batch_size,
+        optimizer=optimizers.OPTIMIZERS[optimizer]() if optimizer is not None else None,
+        schedule=optimizers.SCHEDULES[schedule]() if schedule is not None else None)
+
+    accuracy = training.test(candidate, verification_data)
+    if accuracy >= previous_accuracy - tolerance:
+        logging.info('Accepted retrained weights, accuracy {0:.4f} (was {1:.4f})'.format(accuracy, previous_accuracy))
+        return candidate, accuracy, True
+
+    logging.info('Rejected retrained weights, accuracy {0:.4f} (was {1:.4f})'.format(accuracy, previous_accuracy))
+    return hypothesis, previous_accuracy, False
+
+
+def main(argv):
+    if len(argv) == 7:
+        sys.exit('The old flight data file {0} needs its normalized data file as well'.format(argv[6]))
+
+    hypothesis = checkpoint.load_hypothesis(argv[1], mmap=False)
+    new_data = feature_cache.load(argv[2], argv[3])
+    verification = feature_cache.load(argv[4], argv[5])
+    verification_data = sampling.SampledBlocks(verification.x, verification.y,
+                                               sampling.Sampler(verification.y, shuffle=False))
+    replay_data = feature_cache.load(argv[6], argv[7]) if len(argv) > 7 else None
+
+    hypothesis, accuracy, retrained = retrain(hypothesis, new_data, verification_data, replay_data)
+    if retrained:
+        checkpoint.save(argv[1], hypothesis.network)
+        logging.info('Saved retrained network to {0}'.format(argv[1]))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(filename=training.LOG_FILENAME, level=logging.INFO)
+    main(sys.argv)
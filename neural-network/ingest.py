@@ -0,0 +1,203 @@
+"""ingest.py: Parallel loading of several years of flight data into shared memory."""
+
+__author__ = "Jordon Dornbos"
+
+import logging
+import multiprocessing
+from multiprocessing import resource_tracker
+from multiprocessing import shared_memory
+import numpy
+import feature_cache
+import vectorized
+
+FLIGHT_PATTERN = '../data/flight/{0}.csv'
+NORMALIZED_PATTERN = '../data/normalized/{0}_output.txt'
+
+
+class SharedDataset(object):
+
+    def __init__(self, name, rows, num_inputs, num_outputs, create=False):
+        # every row holds the inputs followed by the outputs of one example, like the feature cache files
+        self.rows = rows
+        self.num_inputs = num_inputs
+        self.num_outputs = num_outputs
+        size = max(rows * (num_inputs + num_outputs) * 8, 1)
+        self.memory = shared_memory.SharedMemory(name, create=create, size=size if create else 0)
+        self.data = numpy.ndarray((rows, num_inputs + num_outputs), dtype=numpy.float64, buffer=self.memory.buf)
+        self.x = self.data[:, :num_inputs]
+        self.y = self.data[:, num_inputs:]
+
+    @classmethod
+    def create(cls, rows, num_inputs, num_outputs):
+        """Method to create a new shared memory block for a data set.
+
+        Args:
+            rows: The number of examples.
+            num_inputs: The number of inputs per example.
+            num_outputs: The number of outputs per example.
+
+        Returns:
+            The data set, which has to be unlinked when no process needs it any more.
+        """
+
+        return cls(None, rows, num_inputs, num_outputs, create=True)
+
+    @classmethod
+    def attach(cls, descriptor):
+        """Method to open a data set created by another process.
+
+        Args:
+            descriptor: The descriptor of the data set.
+
+        Returns:
+            The data set, viewing the same memory as the process that created it.
+        """
+
+        return cls(*descriptor)
+
+    def descriptor(self):
+        """Method to describe the data set so another process can attach to it.
+
+        Returns:
+            A tuple of the shared memory name, the number of rows, inputs and outputs.
+        """
+
+        return self.memory.name, self.rows, self.num_inputs, self.num_outputs
+
+    def blocks(self):
+        """Method to return the examples as blocks of inputs and outputs, see vectorized.as_blocks.
+
+        Returns:
+            A list holding the matrix of inputs and the matrix of outputs.
+        """
+
+        return vectorized.ArrayBlocks(self.x, self.y).blocks()
+
+    def close(self):
+        """Method to stop using the data set in this process."""
+
+        self.x = self.y = self.data = None
+        self.memory.close()
+
+    def unlink(self):
+        """Method to free the shared memory block, once every process has closed it."""
+
+        self.close()
+        self.memory.unlink()
+
+
+def create_pool(processes=None, initializer=None, initargs=()):
+    """Function to create a process pool whose workers can attach to shared data sets.
+
+    The resource tracker is started first so the workers share it with this process. Otherwise every worker starts its
+    own, which removes the shared memory blocks the worker attached to when the worker exits.
+
+    Args:
+        processes: The number of worker processes, defaults to the number of cores.
+        initializer: A function every worker calls when it starts.
+        initargs: The arguments to call the initializer with.
+
+    Returns:
+        The process pool.
+    """
+
+    resource_tracker.ensure_running()
+    return multiprocessing.Pool(processes, initializer, initargs)
+
+
+def share(examples):
+    """Function to copy examples into a new shared data set.
+
+    Args:
+        examples: A set of examples, each with input vector x and output vector y, or a source of blocks of examples.
+
+    Returns:
+        The shared data set, which the caller has to unlink.
+    """
+
+    blocks = list(vectorized.as_blocks(examples).blocks())
+    dataset = SharedDataset.create(sum(len(x) for x, y in blocks), blocks[0][0].shape[1], blocks[0][1].shape[1])
+
+    offset = 0
+    for x, y in blocks:
+        dataset.x[offset:offset + len(x)] = x
+        dataset.y[offset:offset + len(y)] = y
+        offset += len(x)
+
+    return dataset
+
+
+def cache_year(job):
+    """Function to make sure a year of flight data is in the feature cache.
+
+    Args:
+        job: A tuple of the flight data file, the normalized data file and the cache directory.
+
+    Returns:
+        The number of examples, inputs and outputs of the year.
+    """
+
+    filename, normalized_filename, cache_directory = job
+    data = feature_cache.load(filename, normalized_filename, cache_directory)
+
+    return data.x.shape[0], data.x.shape[1], data.y.shape[1]
+
+
+def copy_year(job):
+    """Function to copy a cached year of flight data into its place in a shared data set.
+
+    Args:
+        job: A tuple of the flight data file, the normalized data file, the cache directory, the descriptor of the
+            shared data set and the row to start copying at.
+    """
+
+    filename, normalized_filename, cache_directory, descriptor, offset = job
+    data = feature_cache.load(filename, normalized_filename, cache_directory)
+    dataset = SharedDataset.attach(descriptor)
+    try:
+        dataset.x[offset:offset + len(data.x)] = data.x
+        dataset.y[offset:offset + len(data.y)] = data.y
+    finally:
+        dataset.close()
+
+
+def load_years(years, flight_pattern=FLIGHT_PATTERN, normalized_pattern=NORMALIZED_PATTERN, processes=None,
+               cache_directory=feature_cache.CACHE_DIRECTORY):
+    """Function to load several years of flight data, one worker process per year, into one shared data set.
+
+    Every year is encoded with its own normalized data table. The workers write the examples straight into shared
+    memory, so nothing but their row counts is sent back to this process.
+
+    Args:
+        years: The years to load.
+        flight_pattern: The path of the flight data file of a year, with {0} in place of the year.
+        normalized_pattern: The path of the normalized data file of a year, with {0} in place of the year.
+        processes: The number of worker processes, defaults to one per year (at most the number of cores).
+        cache_directory: The directory holding the feature cache files.
+
+    Returns:
+        A shared data set holding the examples of every year in the order given, which the caller has to unlink.
+    """
+
+    if processes is None:
+        processes = min(len(years), multiprocessing.cpu_count())
+
+    jobs = [(flight_pattern.format(year), normalized_pattern.format(year), cache_directory) for year in years]
+    pool = create_pool(processes)
+    try:
+        # parse (or find in the cache) every year, then copy the years into place side by side
+        shapes = pool.map(cache_year, jobs)
+        offsets = numpy.cumsum([0] + [rows for rows, num_inputs, num_outputs in shapes])
+        logging.info('Loading {0} examples from years {1}'.format(offsets[-1], years))
+
+        dataset = SharedDataset.create(int(offsets[-1]), shapes[0][1], shapes[0][2])
+        try:
+            pool.map(copy_year, [job + (dataset.descriptor(), int(offset)) for job, offset in zip(jobs, offsets)])
+        except Exception:
+            dataset.unlink()
+            raise
+    finally:
+        pool.close()
+        pool.join()
+
+    return dataset
@@ -2,15 +2,26 @@
 
 __author__ = "Jordon Dornbos"
 
+import numpy
 import perceptron
 
 
 class Layer(object):
 
-    def __init__(self, num_nodes, num_inputs_per_node):
+    def __init__(self, num_nodes, num_inputs_per_node, weights=None, in_sums=None, outputs=None):
+        # the layer is a view over the weight and activation buffers of its network, which are created if not given
         self.num_nodes = num_nodes
+        self.num_inputs_per_node = num_inputs_per_node
+
+        # one row of weights per node, with the bias weight in the last column
+        if weights is None:
+            weights = numpy.zeros(num_nodes * (num_inputs_per_node + 1))
+        self.weights = weights.reshape(num_nodes, num_inputs_per_node + 1)
+        self.in_sums = in_sums if in_sums is not None else numpy.zeros(num_nodes)
+        self.outputs = outputs if outputs is not None else numpy.zeros(num_nodes)
 
         # create nodes
         self.nodes = []
         for i in range(num_nodes):
-            self.nodes.append(perceptron.Perceptron(num_inputs_per_node))
\ No newline at end of file
+            self.nodes.append(perceptron.Perceptron(num_inputs_per_node, self.weights[i], self.in_sums, self.outputs,
+                                                    i))
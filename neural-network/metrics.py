@@ -0,0 +1,227 @@
+"""metrics.py: Streaming evaluation of networks, one block of guesses at a time."""
+
+__author__ = "Jordon Dornbos"
+
+import logging
+import numpy
+import vectorized
+
+# the number of equal width ranges the guesses are counted in, the threshold sweep and ROC curve have this resolution
+NUM_BINS = 1000
+
+# guesses are kept this far from 0 and 1 when computing the log loss, so a confident wrong guess costs a finite amount
+LOG_LOSS_EPSILON = 1e-15
+
+
+class Metrics(object):
+
+    def __init__(self, num_bins=NUM_BINS, threshold=0.5):
+        self.num_bins = num_bins
+        self.threshold = threshold  # the confidence above which a guess counts as delayed
+
+        # the exact outcome of every guess at the threshold
+        self.true_positives = 0
+        self.false_positives = 0
+        self.true_negatives = 0
+        self.false_negatives = 0
+
+        # the number of delayed and on time flights per range of guesses, bin 0 holds guesses of 0 and bin b holds
+        # guesses in ((b - 1) / num_bins, b / num_bins]
+        self.positives = numpy.zeros(num_bins + 1, dtype=numpy.int64)
+        self.negatives = numpy.zeros(num_bins + 1, dtype=numpy.int64)
+
+        self.total_log_loss = 0.0
+
+    def update(self, guesses, actual):
+        """Method to add a block of guesses to the statistics.
+
+        Args:
+            guesses: An array with the confidence of every flight being delayed.
+            actual: An array holding 1.0 for every delayed flight and 0.0 for every flight on time.
+        """
+
+        guesses = numpy.asarray(guesses, numpy.float64)
+        delayed = numpy.asarray(actual) == 1.0
+
+        output = guesses > self.threshold
+        self.true_positives += int(numpy.count_nonzero(output & delayed))
+        self.false_negatives += int(numpy.count_nonzero(~output & delayed))
+        self.true_negatives += int(numpy.count_nonzero(~output & ~delayed))
+        self.false_positives += int(numpy.count_nonzero(output & ~delayed))
+
+        bins = numpy.clip(numpy.ceil(guesses * self.num_bins), 0, self.num_bins).astype(numpy.intp)
+        self.positives += numpy.bincount(bins[delayed], minlength=self.num_bins + 1)
+        self.negatives += numpy.bincount(bins[~delayed], minlength=self.num_bins + 1)
+
+        clipped = numpy.clip(guesses, LOG_LOSS_EPSILON, 1.0 - LOG_LOSS_EPSILON)
+        self.total_log_loss -= float(numpy.log(clipped[delayed]).sum() + numpy.log1p(-clipped[~delayed]).sum())
+
+    def count(self):
+        """Method to count the flights added so far.
+
+        Returns:
+            The number of flights.
+        """
+
+        return self.true_positives + self.false_positives + self.true_negatives + self.false_negatives
+
+    def confusion_matrix(self):
+        """Method to get the outcome of every guess at the threshold.
+
+        Returns:
+            A 2x2 matrix of counts, rows are the actual class and columns the guessed class (on time first).
+        """
+
+        return numpy.array([[self.true_negatives, self.false_positives],
+                            [self.false_negatives, self.true_positives]])
+
+    def accuracy(self):
+        """Method to get the fraction of flights guessed right at the threshold.
+
+        Returns:
+            The accuracy, 0.0 if no flights were added.
+        """
+
+        count = self.count()
+        return float(self.true_positives + self.true_negatives) / count if count else 0.0
+
+    def precision(self):
+        """Method to get the fraction of flights guessed to be delayed that were delayed.
+
+        Returns:
+            The precision, 0.0 if no flight was guessed to be delayed.
+        """
+
+        guessed = self.true_positives + self.false_positives
+        return float(self.true_positives) / guessed if guessed else 0.0
+
+    def recall(self):
+        """Method to get the fraction of delayed flights guessed to be delayed.
+
+        Returns:
+            The recall, 0.0 if no flight was delayed.
+        """
+
+        delayed = self.true_positives + self.false_negatives
+        return float(self.true_positives) / delayed if delayed else 0.0
+
+    def log_loss(self):
+        """Method to get the mean cross entropy between the guesses and the actual classes.
+
+        Returns:
+            The log loss, 0.0 if no flights were added.
+        """
+
+        count = self.count()
+        return self.total_log_loss / count if count else 0.0
+
+    def counts_above(self):
+        """Method to count the delayed and on time flights guessed above every bin edge.
+
+        Returns:
+            Two arrays of num_bins + 2 counts of delayed and on time flights, entry b counting the flights in bin b or
+            above, so entry k + 1 counts the guesses above the threshold k / num_bins.
+        """
+
+        zero = numpy.zeros(1, dtype=numpy.int64)
+        positives = numpy.concatenate((numpy.cumsum(self.positives[::-1])[::-1], zero))
+        negatives = numpy.concatenate((numpy.cumsum(self.negatives[::-1])[::-1], zero))
+
+        return positives, negatives
+
+    def threshold_sweep(self):
+        """Method to get the accuracy at every bin edge used as the threshold, without guessing again.
+
+        Returns:
+            An array of the thresholds 0, 1 / num_bins, ..., 1 and an array of the accuracy at each of them.
+        """
+
+        positives, negatives = self.counts_above()
+        count = self.count()
+        thresholds = numpy.arange(self.num_bins + 1) / float(self.num_bins)
+        correct = positives[1:] + (negatives[0] - negatives[1:])
+
+        return thresholds, correct / float(count) if count else numpy.zeros(len(thresholds))
+
+    def best_threshold(self):
+        """Method to find the bin edge giving the highest accuracy.
+
+        Returns:
+            The threshold and its accuracy.
+        """
+
+        thresholds, accuracies = self.threshold_sweep()
+        best = int(numpy.argmax(accuracies))
+
+        return float(thresholds[best]), float(accuracies[best])
+
+    def roc_curve(self):
+        """Method to get the ROC curve, from guessing every flight delayed to guessing none.
+
+        Returns:
+            An array of false positive rates and an array of true positive rates, one per bin edge.
+        """
+
+        positives, negatives = self.counts_above()
+        return negatives / float(max(negatives[0], 1)), positives / float(max(positives[0], 1))
+
+    def auc(self):
+        """Method to get the area under the ROC curve.
+
+        Guesses in the same bin count as ties, so the area is exact up to the resolution of the bins.
+
+        Returns:
+            The area, 0.5 if there are no delayed or no on time flights.
+        """
+
+        if not self.positives.sum() or not self.negatives.sum():
+            return 0.5
+
+        false_positive_rates, true_positive_rates = self.roc_curve()
+        return float(numpy.sum((false_positive_rates[:-1] - false_positive_rates[1:]) *
+                               (true_positive_rates[:-1] + true_positive_rates[1:]) / 2.0))
+
+    def report(self):
+        """Method to gather every metric.
+
+        Returns:
+            A map from the name of every metric to its value.
+        """
+
+        best_threshold, best_accuracy = self.best_threshold()
+        return {'count': self.count(),
+                'accuracy': self.accuracy(),
+                'precision': self.precision(),
+                'recall': self.recall(),
+                'log_loss': self.log_loss(),
+                'auc': self.auc(),
+                'best_threshold': best_threshold,
+                'best_threshold_accuracy': best_accuracy}
+
+
+def evaluate(network, verification_data, num_bins=NUM_BINS, threshold=0.5, verbose=False):
+    """Function to compute every metric of a network, guessing one block of examples at a time.
+
+    Args:
+        network: The hypothesis network, or any network with guess_batch.
+        verification_data: A set of examples, each with input vector x and output vector y, or a source of blocks of
+            examples.
+        num_bins: The number of ranges to count the guesses in.
+        threshold: The confidence above which a guess counts as delayed.
+        verbose: Whether to log every guess.
+
+    Returns:
+        The metrics.
+    """
+
+    metrics = Metrics(num_bins, threshold)
+    for x, y in vectorized.as_blocks(verification_data).blocks():
+        guesses = network.guess_batch(x)[:, 0]
+        actual = y[:, 0]
+        if verbose:
+            for i in range(len(guesses)):
+                logging.info('Output: {0:.3f} Actual: {1}'.format(guesses[i], actual[i]))
+
+        metrics.update(guesses, actual)
+
+    return metrics
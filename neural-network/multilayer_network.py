@@ -5,27 +5,64 @@ __author__ = "Jordon Dornbos"
 import layer
 import math
 import logging
+import numpy
 
 
 class MultilayerNetwork(object):
 
-    def __init__(self, num_input_nodes, num_hidden_layers, num_nodes_per_hidden_layer, num_output_nodes):
+    def __init__(self, num_input_nodes, num_hidden_layers, num_nodes_per_hidden_layer, num_output_nodes,
+                 activation='sigmoid', weights=None):
         self.num_input_nodes = num_input_nodes
         self.num_hidden_layers = num_hidden_layers
         self.num_nodes_per_hidden_layer = num_nodes_per_hidden_layer
         self.num_output_nodes = num_output_nodes
+        self.activation = activation    # the name of the matrix engine activation, see vectorized.ACTIVATIONS
+
+        # number of nodes in every layer, from the input layer to the output layer
+        self.layer_sizes = [num_input_nodes] + [num_nodes_per_hidden_layer] * num_hidden_layers + [num_output_nodes]
+
+        # precompute where every layer starts in the weight buffer and in the node buffers
+        self.weight_offsets = [0, 0]
+        self.node_offsets = [0]
+        for l in range(1, len(self.layer_sizes)):
+            self.weight_offsets.append(self.weight_offsets[-1] +
+                                       self.layer_sizes[l] * (self.layer_sizes[l - 1] + 1))
+            self.node_offsets.append(self.node_offsets[-1] + self.layer_sizes[l - 1])
+        self.node_offsets.append(self.node_offsets[-1] + self.layer_sizes[-1])
+
+        # one flat buffer holds every weight, in the order used by load_weights and weight_string (an existing buffer,
+        # such as a mapped checkpoint, can be given instead)
+        self.weights = weights if weights is not None else numpy.zeros(self.weight_offsets[-1])
+        self.in_sums = numpy.zeros(self.node_offsets[-1])
+        self.outputs = numpy.zeros(self.node_offsets[-1])
 
         # create input layer
-        self.input_layer = layer.Layer(num_input_nodes, 0)
+        self.input_layer = self.create_layer(0)
 
         # create hidden layers
         self.hidden_layers = []
-        self.hidden_layers.append(layer.Layer(num_nodes_per_hidden_layer, num_input_nodes))
-        for i in range(num_hidden_layers - 1):
-            self.hidden_layers.append(layer.Layer(num_nodes_per_hidden_layer, num_nodes_per_hidden_layer))
+        for l in range(1, num_hidden_layers + 1):
+            self.hidden_layers.append(self.create_layer(l))
 
         # create output layer
-        self.output_layer = layer.Layer(num_output_nodes, num_nodes_per_hidden_layer)
+        self.output_layer = self.create_layer(num_hidden_layers + 1)
+
+    def create_layer(self, l):
+        """Method to create a layer that views its part of the network buffers.
+
+        Args:
+            l: The layer number.
+
+        Returns:
+            The layer created.
+        """
+
+        nodes = slice(self.node_offsets[l], self.node_offsets[l + 1])
+        if l == 0:
+            return layer.Layer(self.layer_sizes[l], 0, in_sums=self.in_sums[nodes], outputs=self.outputs[nodes])
+
+        return layer.Layer(self.layer_sizes[l], self.layer_sizes[l - 1], self.layer_weights(l),
+                           self.in_sums[nodes], self.outputs[nodes])
 
     def num_nodes(self):
         """Function to return the number of nodes in the network.
@@ -88,11 +125,32 @@ class MultilayerNetwork(object):
             The position of the node in the network.
         """
 
-        pos = n
-        for i in range(l):
-            pos += self.get_layer(i).num_nodes
+        return self.node_offsets[l] + n
 
-        return pos
+    def layer_weights(self, l):
+        """Method to return the weights of a layer as a matrix.
+
+        Args:
+            l: The layer number, starting at 1 for the first hidden layer.
+
+        Returns:
+            A view of the weight buffer with one row per node and the bias weight in the last column.
+        """
+
+        return self.weights[self.weight_offsets[l]:self.weight_offsets[l + 1]].reshape(
+            self.layer_sizes[l], self.layer_sizes[l - 1] + 1)
+
+    def layer_outputs(self, l):
+        """Method to return the outputs of a layer.
+
+        Args:
+            l: The layer number.
+
+        Returns:
+            A view of the output buffer holding the outputs of the layer.
+        """
+
+        return self.outputs[self.node_offsets[l]:self.node_offsets[l + 1]]
 
     def load_weights(self, weights):
         """Method to load a given set of weights into the network.
@@ -101,12 +159,16 @@ class MultilayerNetwork(object):
             weights: An array of weights to put in the network.
         """
 
-        i = 0
-        for l in range(1, self.num_layers()):
-            for n in range(self.get_layer(l).num_nodes):
-                for w in range(len(self.get_node_in_layer(l, n).weights)):
-                    self.get_node_in_layer(l, n).weights[w] = weights[i]
-                    i += 1
+        self.weights[:] = weights[:len(self.weights)]
+
+    def copy_weights(self):
+        """Method to take a snapshot of the weights in the network.
+
+        Returns:
+            A copy of the weight buffer, which can be given back to load_weights.
+        """
+
+        return self.weights.copy()
 
     def weight_string(self, round=False):
         """Method to return a string representation of the weights in the network.
@@ -116,14 +178,11 @@ class MultilayerNetwork(object):
         """
 
         weight_string = '['
-        for l in range(1, self.num_layers()):
-            for n in range(self.get_layer(l).num_nodes):
-                weights = self.get_node_in_layer(l, n).weights
-                for w in range(len(weights)):
-                    if round:
-                        weight_string += ' {0:.3f} '.format(weights[w])
-                    else:
-                        weight_string += ' {0} '.format(weights[w])
+        for weight in self.weights.tolist():
+            if round:
+                weight_string += ' {0:.3f} '.format(weight)
+            else:
+                weight_string += ' {0} '.format(weight)
         weight_string += ']'
 
         return weight_string
@@ -152,4 +211,18 @@ def sigmoid_derivative(x):
         The value of the sigmoid derivative function for a given x.
     """
 
-    return sigmoid(x) * (1.0 - sigmoid(x))
\ No newline at end of file
+    output = sigmoid(x)
+    return output * (1.0 - output)
+
+
+def sigmoid_output_derivative(output):
+    """The derivative of the sigmoid function, computed from the output of the sigmoid function.
+
+    Args:
+        output: The sigmoid value already computed for a given x.
+
+    Returns:
+        The value of the sigmoid derivative function for that x.
+    """
+
+    return output * (1.0 - output)
\ No newline at end of file
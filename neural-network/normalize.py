@@ -0,0 +1,193 @@
+"""normalize.py: Generator for the normalized delay rate tables read by flight_data.get_normalized_data."""
+
+__author__ = "Jordon Dornbos"
+
+import collections
+import multiprocessing
+import os
+import sys
+import numpy
+import csv_columns
+import encoding
+import flight_data
+
+SECTIONS = ['time', 'distance', 'carrier', 'airports']
+
+
+def chunk_offsets(filename, num_chunks):
+    """Function to split a flight data file into chunks of whole lines.
+
+    Args:
+        filename: The flight data file.
+        num_chunks: The number of chunks to split the file into.
+
+    Returns:
+        A list of (start, end) byte offsets, the first chunk starting after the header.
+    """
+
+    size = os.path.getsize(filename)
+    with open(filename, 'rb') as file:
+        file.readline()     # skip the header
+        offsets = [file.tell()]
+        for i in range(1, num_chunks):
+            # move every boundary forward to the start of the next line
+            file.seek(max(size * i // num_chunks, offsets[-1]))
+            file.readline()
+            offsets.append(min(file.tell(), size))
+    offsets.append(size)
+
+    return [(offsets[i], offsets[i + 1]) for i in range(num_chunks) if offsets[i] < offsets[i + 1]]
+
+
+def add_counts(counter, buckets, indices, rows):
+    """Function to count the rows falling in every bucket.
+
+    Args:
+        counter: The counter to add to.
+        buckets: A list of buckets.
+        indices: The index in buckets of every row.
+        rows: A boolean array marking the rows to count.
+    """
+
+    counts = numpy.bincount(indices[rows], minlength=len(buckets))
+    for bucket, count in zip(buckets, counts.tolist()):
+        if count:
+            counter[bucket] += count
+
+
+def count_chunk(job):
+    """Function to count the total and delayed flights of every bucket in a chunk of a flight data file.
+
+    Args:
+        job: A tuple of the flight data file, the start and end byte offsets of the chunk, the column holding the
+            delay and the number of minutes a flight has to be delayed by to count as delayed.
+
+    Returns:
+        A map from every section to a counter of total flights per bucket and a counter of delayed flights per bucket.
+    """
+
+    filename, start, end, delay_column, delay_threshold = job
+    totals = dict((section, collections.Counter()) for section in SECTIONS)
+    delayed = dict((section, collections.Counter()) for section in SECTIONS)
+
+    columns = [flight_data.CANCELLED_COLUMN, flight_data.TIME_COLUMN, flight_data.DISTANCE_COLUMN,
+               flight_data.CARRIER_COLUMN, flight_data.AIRPORT_COLUMN, delay_column]
+    for cancelled, times, distances, carriers, airports, delays in csv_columns.read_columns(filename, columns,
+                                                                                            start=start, end=end):
+        cancelled = csv_columns.to_float(cancelled)
+        distances = csv_columns.to_float(distances)
+        delays = csv_columns.to_float(delays)
+
+        # the buckets of every section, as a list of buckets and the index of the bucket of every row
+        times, time_indices = csv_columns.distinct(times)
+        times = [encoding.time_bucket(value) for value in times]
+        sections = [(times, time_indices),
+                    ([str(bucket) for bucket in range(len(encoding.DISTANCE_BOUNDS) + 1)],
+                     numpy.searchsorted(encoding.DISTANCE_BOUNDS, distances, side='right')),
+                    csv_columns.distinct(carriers),
+                    csv_columns.distinct(airports)]
+
+        # only consider flights that haven't been canceled, with every value valid
+        rows = (cancelled == cancelled) & (cancelled != 1.0) & ~numpy.isnan(distances) & ~numpy.isnan(delays)
+        rows &= numpy.array([bucket is not None for bucket in times], dtype=bool)[time_indices]
+        is_delayed = rows & (delays > delay_threshold)
+
+        for section, (buckets, indices) in zip(SECTIONS, sections):
+            if section in ('carrier', 'airports'):
+                buckets = [bucket.decode('utf-8') for bucket in buckets]
+            add_counts(totals[section], buckets, indices, rows)
+            add_counts(delayed[section], buckets, indices, is_delayed)
+
+    return totals, delayed
+
+
+def count_file(filename, processes=None, delay_column=flight_data.DELAY_COLUMN,
+               delay_threshold=flight_data.DELAY_THRESHOLD):
+    """Function to count the total and delayed flights of every bucket in a flight data file, one chunk per process.
+
+    Args:
+        filename: The flight data file.
+        processes: The number of worker processes, defaults to the number of cores.
+        delay_column: The column holding the delay in minutes.
+        delay_threshold: The number of minutes a flight has to be delayed by to count as delayed.
+
+    Returns:
+        A map from every section to a counter of total flights per bucket and a counter of delayed flights per bucket.
+    """
+
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+
+    jobs = [(filename, start, end, delay_column, delay_threshold)
+            for start, end in chunk_offsets(filename, processes * 4)]
+
+    totals = dict((section, collections.Counter()) for section in SECTIONS)
+    delayed = dict((section, collections.Counter()) for section in SECTIONS)
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        # merge the counts of every chunk as they finish
+        for chunk_totals, chunk_delayed in pool.imap_unordered(count_chunk, jobs):
+            for section in SECTIONS:
+                totals[section].update(chunk_totals[section])
+                delayed[section].update(chunk_delayed[section])
+    finally:
+        pool.close()
+        pool.join()
+
+    return totals, delayed
+
+
+def format_rate(total, delayed):
+    """Function to format a delay rate the way the existing tables do.
+
+    Args:
+        total: The number of flights.
+        delayed: The number of delayed flights.
+
+    Returns:
+        The rate rounded to 12 significant digits.
+    """
+
+    return repr(float('{0:.12g}'.format(float(delayed) / total)))
+
+
+def write_tables(file, totals, delayed):
+    """Function to write the normalized data tables in the format read by flight_data.get_normalized_data.
+
+    Time and distance buckets are written in order, carriers and airports from the most to the least flights.
+
+    Args:
+        file: The file to write to.
+        totals: A map from every section to a counter of total flights per bucket.
+        delayed: A map from every section to a counter of delayed flights per bucket.
+    """
+
+    headers = {'time': 'time has : ',
+               'distance': 'distance has : ',
+               'carrier': 'carrier has :  {0}'.format(len(totals['carrier'])),
+               'airports': 'us has airports:  {0}'.format(len(totals['airports']))}
+
+    for section in SECTIONS:
+        if section in ('time', 'distance'):
+            buckets = sorted(totals[section], key=int)
+        else:
+            buckets = sorted(totals[section], key=lambda bucket: (-totals[section][bucket], bucket))
+
+        file.write(headers[section] + '\n')
+        for bucket in buckets:
+            file.write('{0},{1},{2},{3}\n'.format(bucket, totals[section][bucket], delayed[section][bucket],
+                                                  format_rate(totals[section][bucket], delayed[section][bucket])))
+
+
+def main(argv):
+    # usage: python normalize.py <flight data file> <output file> [processes]
+    processes = int(argv[3]) if len(argv) > 3 else None
+    totals, delayed = count_file(argv[1], processes)
+
+    with open(argv[2], 'w') as file:
+        write_tables(file, totals, delayed)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,190 @@
+"""optimizers.py: Weight update rules and learning rate schedules for the matrix engine."""
+
+__author__ = "Jordon Dornbos"
+
+import math
+import numpy
+
+
+class Optimizer(object):
+
+    num_slots = 0   # the number of values kept per weight
+
+    def __init__(self):
+        # the values kept per weight, in one array with a view per slot and layer so they line up with the weights
+        self.state = None
+        self.views = None
+
+    def prepare(self, matrices):
+        """Method to allocate the values kept per weight, the first time the optimizer sees the weights.
+
+        Args:
+            matrices: A list of weight matrices where index l - 1 holds the weights of layer l.
+        """
+
+        if self.views is not None:
+            return
+
+        offsets = numpy.cumsum([0] + [matrix.size for matrix in matrices])
+        self.state = numpy.zeros((self.num_slots, offsets[-1]))
+        self.views = [[self.state[k, offsets[l]:offsets[l + 1]].reshape(matrices[l].shape)
+                       for k in range(self.num_slots)] for l in range(len(matrices))]
+
+    def step(self, matrices, gradients, alpha):
+        """Method to update the weights with the gradients of a batch.
+
+        Args:
+            matrices: A list of weight matrices where index l - 1 holds the weights of layer l.
+            gradients: A list of matrices holding the weight changes averaged over the batch, in the direction that
+                lowers the error.
+            alpha: The learning rate.
+        """
+
+        self.prepare(matrices)
+        for l in range(len(matrices)):
+            self.update(matrices[l], gradients[l], self.views[l], alpha)
+
+    def update(self, weights, gradient, state, alpha):
+        """Method to update the weights of a layer.
+
+        Args:
+            weights: The weight matrix of the layer.
+            gradient: The weight changes of the layer averaged over the batch.
+            state: A list of the matrices of values kept per weight of the layer.
+            alpha: The learning rate.
+        """
+
+        weights += alpha * gradient
+
+
+class Momentum(Optimizer):
+
+    num_slots = 1
+
+    def __init__(self, momentum=0.9, nesterov=False):
+        super(Momentum, self).__init__()
+        self.momentum = momentum
+        self.nesterov = nesterov    # whether to take the step from where the velocity is about to carry the weights
+
+    def update(self, weights, gradient, state, alpha):
+        velocity = state[0]
+        velocity *= self.momentum
+        velocity += gradient
+
+        if self.nesterov:
+            weights += alpha * (gradient + self.momentum * velocity)
+        else:
+            weights += alpha * velocity
+
+
+class RmsProp(Optimizer):
+
+    num_slots = 1
+
+    def __init__(self, decay=0.9, epsilon=1e-8):
+        super(RmsProp, self).__init__()
+        self.decay = decay
+        self.epsilon = epsilon
+
+    def update(self, weights, gradient, state, alpha):
+        # running mean of the squared gradient
+        mean_square = state[0]
+        mean_square *= self.decay
+        mean_square += (1.0 - self.decay) * gradient * gradient
+
+        weights += alpha * gradient / (numpy.sqrt(mean_square) + self.epsilon)
+
+
+class Adam(Optimizer):
+
+    num_slots = 2
+
+    def __init__(self, beta1=0.9, beta2=0.999, epsilon=1e-8):
+        super(Adam, self).__init__()
+        self.beta1 = beta1
+        self.beta2 = beta2
+        self.epsilon = epsilon
+        self.steps = 0
+
+    def step(self, matrices, gradients, alpha):
+        self.steps += 1
+
+        # correct for the running means starting at zero
+        alpha *= math.sqrt(1.0 - self.beta2 ** self.steps) / (1.0 - self.beta1 ** self.steps)
+        super(Adam, self).step(matrices, gradients, alpha)
+
+    def update(self, weights, gradient, state, alpha):
+        mean, mean_square = state
+        mean *= self.beta1
+        mean += (1.0 - self.beta1) * gradient
+        mean_square *= self.beta2
+        mean_square += (1.0 - self.beta2) * gradient * gradient
+
+        weights += alpha * mean / (numpy.sqrt(mean_square) + self.epsilon)
+
+
+# optimizers a network can be trained with by name
+OPTIMIZERS = {'sgd': Optimizer,
+              'momentum': Momentum,
+              'nesterov': lambda: Momentum(nesterov=True),
+              'rmsprop': RmsProp,
+              'adam': Adam}
+
+
+class LinearSchedule(object):
+
+    def __call__(self, alpha, iteration, iteration_max):
+        """Method to compute the learning rate of an iteration.
+
+        Args:
+            alpha: The starting learning rate.
+            iteration: The iteration about to be performed.
+            iteration_max: The maximum amount of iterations.
+
+        Returns:
+            The learning rate, dropping in a straight line to zero at iteration_max.
+        """
+
+        return alpha * (1 - (float(iteration) / iteration_max))
+
+
+class ConstantSchedule(object):
+
+    def __call__(self, alpha, iteration, iteration_max):
+        return alpha
+
+
+class StepSchedule(object):
+
+    def __init__(self, drop=0.5, interval=10):
+        self.drop = drop            # the factor the learning rate is multiplied by
+        self.interval = interval    # every this many iterations
+
+    def __call__(self, alpha, iteration, iteration_max):
+        return alpha * self.drop ** (iteration // self.interval)
+
+
+class ExponentialSchedule(object):
+
+    def __init__(self, decay=0.95):
+        self.decay = decay  # the factor the learning rate is multiplied by every iteration
+
+    def __call__(self, alpha, iteration, iteration_max):
+        return alpha * self.decay ** iteration
+
+
+class CosineSchedule(object):
+
+    def __init__(self, minimum=0.0):
+        self.minimum = minimum  # the learning rate reached at iteration_max
+
+    def __call__(self, alpha, iteration, iteration_max):
+        return self.minimum + (alpha - self.minimum) * 0.5 * (1 + math.cos(math.pi * iteration / iteration_max))
+
+
+# learning rate schedules a network can be trained with by name
+SCHEDULES = {'linear': LinearSchedule,
+             'constant': ConstantSchedule,
+             'step': StepSchedule,
+             'exponential': ExponentialSchedule,
+             'cosine': CosineSchedule}
@@ -0,0 +1,283 @@
+"""parallel_training.py: Data parallel backpropagation over several worker processes."""
+
+__author__ = "Jordon Dornbos"
+
+import logging
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy
+import back_prop_learning
+import hypothesis_network
+import ingest
+import multilayer_network
+import optimizers
+import vectorized
+
+# ways of combining what the workers learn
+MODES = ('sync', 'hogwild')
+
+# the default number of examples each worker learns from per weight update, large enough that waiting for every
+# worker after every batch costs little next to learning from it
+BATCH_SIZE = 256
+
+
+def shared_array(shape, name=None):
+    """Function to create, or attach to, an array of floats in shared memory.
+
+    Args:
+        shape: The shape of the array.
+        name: The name of an existing shared memory block, None to create a new one (filled with zeros).
+
+    Returns:
+        The shared memory block and an array viewing it.
+    """
+
+    size = max(int(numpy.prod(shape)) * 8, 1)
+    memory = shared_memory.SharedMemory(name, create=name is None, size=size if name is None else 0)
+    array = numpy.ndarray(shape, dtype=numpy.float64, buffer=memory.buf)
+    if name is None:
+        array[...] = 0.0
+
+    return memory, array
+
+
+def network_shape(network):
+    """Function to describe the shape of a network so a worker process can build a network viewing other weights.
+
+    Args:
+        network: A multilayer network with L layers, weights W(j,i), activation function g.
+
+    Returns:
+        A tuple of the arguments to create a multilayer network with.
+    """
+
+    return (network.num_input_nodes, network.num_hidden_layers, network.num_nodes_per_hidden_layer,
+            network.num_output_nodes, network.activation)
+
+
+def shard(rows, rank, processes):
+    """Function to find the rows of the examples a worker learns from.
+
+    Args:
+        rows: The number of examples.
+        rank: The index of the worker.
+        processes: The number of workers.
+
+    Returns:
+        The first row and the row after the last row of the worker's shard.
+    """
+
+    return rows * rank // processes, rows * (rank + 1) // processes
+
+
+def sync_worker(rank, processes, descriptor, shape, names, barrier, alpha, iteration_max, batch_size, optimizer,
+                schedule, verbose):
+    """Function run by every worker to learn with gradients averaged over all workers after every batch.
+
+    Every worker keeps its own copy of the weights. After every batch the summed weight changes of all workers are
+    added up and applied by every worker, so the copies stay identical and the result is the same as learning with one
+    process and batches processes times as large.
+
+    Args:
+        rank: The index of the worker.
+        processes: The number of workers.
+        descriptor: The descriptor of the shared data set holding the examples.
+        shape: The shape of the network, see network_shape.
+        names: The names of the shared memory blocks holding the weights, gradients and batch sizes.
+        barrier: The barrier the workers wait at between the phases of a batch.
+        alpha: The learning rate.
+        iteration_max: The number of passes over the examples.
+        batch_size: The number of examples each worker learns from per weight update, None to use its whole shard.
+        optimizer: The optimizer to update the weights with, every worker keeps its own copy fed the same average so
+            they stay identical. None to add alpha times the weight changes.
+        schedule: A function of alpha, the iteration and iteration_max returning the learning rate of the iteration.
+        verbose: Whether the first worker logs every learning iteration.
+    """
+
+    dataset = ingest.SharedDataset.attach(descriptor)
+    network = multilayer_network.MultilayerNetwork(*shape)
+    weights_memory, weights = shared_array(network.weights.shape, names[0])
+    gradients_memory, gradients = shared_array((processes,) + network.weights.shape, names[1])
+    counts_memory, counts = shared_array((processes,), names[2])
+    try:
+        network.load_weights(weights)
+        matrices = vectorized.layer_matrices(network)
+        gradient_matrices = vectorized.layer_matrices(multilayer_network.MultilayerNetwork(*shape,
+                                                                                           weights=gradients[rank]))
+        activation = vectorized.ACTIVATIONS[network.activation]
+        if optimizer is not None:
+            average = multilayer_network.MultilayerNetwork(*shape)
+            average_matrices = vectorized.layer_matrices(average)
+
+        start, end = shard(dataset.rows, rank, processes)
+        x, y = dataset.x[start:end], dataset.y[start:end]
+
+        # every worker takes the same number of steps, so the largest shard sets it
+        largest = shard(dataset.rows, processes - 1, processes)
+        step_size = batch_size if batch_size is not None else max(largest[1] - largest[0], 1)
+        steps = -(-(largest[1] - largest[0]) // step_size)
+
+        for iteration in range(iteration_max):
+            new_alpha = schedule(alpha, iteration, iteration_max)
+            if verbose and rank == 0:
+                logging.info('Neural network learning loop {0} of {1} with alpha: {2}'.format(iteration, iteration_max,
+                                                                                              new_alpha))
+
+            for step in range(steps):
+                batch_x = x[step * step_size:(step + 1) * step_size]
+                batch_y = y[step * step_size:(step + 1) * step_size]
+                if len(batch_x):
+                    outputs = vectorized.feed_forward(matrices, batch_x, activation)
+                    output_delta = outputs[-1] * (1.0 - outputs[-1]) * (batch_y - outputs[-1])
+                    vectorized.weight_gradients(outputs, vectorized.delta_propagation(matrices, outputs, output_delta),
+                                                gradient_matrices)
+                else:
+                    gradients[rank] = 0.0
+                counts[rank] = len(batch_x)
+                barrier.wait()
+
+                # every worker applies the same average, then waits so no gradient is overwritten while being read
+                total = counts.sum()
+                if total and optimizer is not None:
+                    numpy.divide(gradients.sum(axis=0), total, out=average.weights)
+                    optimizer.step(matrices, average_matrices, new_alpha)
+                elif total:
+                    network.weights += (new_alpha / total) * gradients.sum(axis=0)
+                barrier.wait()
+
+        if rank == 0:
+            weights[:] = network.weights
+    except Exception:
+        # release the other workers rather than leave them waiting for this one
+        barrier.abort()
+        raise
+    finally:
+        # views of shared memory have to be dropped before it can be closed
+        x = y = batch_x = batch_y = outputs = gradient_matrices = weights = gradients = counts = None
+        dataset.close()
+        weights_memory.close()
+        gradients_memory.close()
+        counts_memory.close()
+
+
+def hogwild_worker(rank, processes, descriptor, shape, names, barrier, alpha, iteration_max, batch_size, optimizer,
+                   schedule, verbose):
+    """Function run by every worker to learn straight into the shared weights, without any locking.
+
+    The workers read and update the same weights at the same time, so an update can be lost now and then. With few
+    weights touched per example this costs little accuracy and the workers never wait for each other.
+
+    Args:
+        rank: The index of the worker.
+        processes: The number of workers.
+        descriptor: The descriptor of the shared data set holding the examples.
+        shape: The shape of the network, see network_shape.
+        names: The names of the shared memory blocks holding the weights, gradients and batch sizes.
+        barrier: Unused, the workers do not wait for each other.
+        alpha: The learning rate.
+        iteration_max: The number of passes over the examples.
+        batch_size: The number of examples to learn from per weight update, None to use the whole shard.
+        optimizer: The optimizer to update the weights with, every worker keeps its own values per weight. None to add
+            alpha times the weight changes.
+        schedule: A function of alpha, the iteration and iteration_max returning the learning rate of the iteration.
+        verbose: Whether the first worker logs every learning iteration.
+    """
+
+    dataset = ingest.SharedDataset.attach(descriptor)
+    network = multilayer_network.MultilayerNetwork(*shape)
+    weights_memory, weights = shared_array(network.weights.shape, names[0])
+    try:
+        network = multilayer_network.MultilayerNetwork(*shape, weights=weights)
+        matrices = vectorized.layer_matrices(network)
+        activation = vectorized.ACTIVATIONS[network.activation]
+
+        start, end = shard(dataset.rows, rank, processes)
+        x, y = dataset.x[start:end], dataset.y[start:end]
+
+        for iteration in range(iteration_max):
+            new_alpha = schedule(alpha, iteration, iteration_max)
+            if verbose and rank == 0:
+                logging.info('Neural network learning loop {0} of {1} with alpha: {2}'.format(iteration, iteration_max,
+                                                                                              new_alpha))
+            vectorized.learn_loop(matrices, x, y, new_alpha, batch_size, activation, optimizer=optimizer)
+    finally:
+        x = y = network = matrices = weights = None
+        dataset.close()
+        weights_memory.close()
+
+
+def train_parallel(examples, network, alpha=0.3, iteration_max=5000, weights=None, processes=None, mode='sync',
+                   batch_size=BATCH_SIZE, optimizer=None, schedule=None, verbose=False):
+    """Backpropagation with the examples split across worker processes.
+
+    Args:
+        examples: A set of examples, each with input vector x and output vector y, a source of blocks of examples (see
+            vectorized.as_blocks) or an ingest.SharedDataset, which the workers use without copying it.
+        network: A multilayer network with L layers, weights W(j,i), activation function g.
+        alpha: The learning rate.
+        iteration_max: The number of passes over the examples.
+        weights: Starting weights to load into the network.
+        processes: The number of worker processes, defaults to the number of cores.
+        mode: Either 'sync' to average the weight changes of every worker after every batch, or 'hogwild' to let every
+            worker update shared weights as it goes. The sync mode waits for every worker after every batch, so it
+            needs batches of hundreds of examples to be faster than one process.
+        batch_size: The number of examples each worker learns from per weight update, None to use its whole shard.
+        optimizer: The optimizer to update the weights with (see optimizers.py), None to add alpha times the weight
+            changes.
+        schedule: A function of alpha, the iteration and iteration_max returning the learning rate of the iteration
+            (see optimizers.SCHEDULES), None to drop the learning rate linearly to zero.
+        verbose: Whether or not to log every learning iteration.
+
+    Returns:
+        A hypothesis neural network.
+    """
+
+    if mode not in MODES:
+        raise ValueError('Unknown parallel training mode {0}, expected one of {1}'.format(mode, MODES))
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    if schedule is None:
+        schedule = optimizers.LinearSchedule()
+
+    if weights is not None:
+        network.load_weights(weights)
+    else:
+        back_prop_learning.randomize_weights(network)
+
+    # put the examples in shared memory once, unless they already are
+    dataset = examples if isinstance(examples, ingest.SharedDataset) else ingest.share(examples)
+
+    weights_memory, shared_weights = shared_array(network.weights.shape)
+    gradients_memory, gradients = shared_array((processes,) + network.weights.shape)
+    counts_memory, counts = shared_array((processes,))
+    try:
+        shared_weights[:] = network.weights
+        names = (weights_memory.name, gradients_memory.name, counts_memory.name)
+        barrier = multiprocessing.Barrier(processes)
+        target = sync_worker if mode == 'sync' else hogwild_worker
+
+        logging.info('Training on {0} examples with {1} {2} workers'.format(dataset.rows, processes, mode))
+        workers = [multiprocessing.Process(target=target, args=(rank, processes, dataset.descriptor(),
+                                                                network_shape(network), names, barrier, alpha,
+                                                                iteration_max, batch_size, optimizer, schedule,
+                                                                verbose))
+                   for rank in range(processes)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        failed = [rank for rank, worker in enumerate(workers) if worker.exitcode != 0]
+        if failed:
+            raise RuntimeError('Parallel training workers {0} failed'.format(failed))
+
+        network.load_weights(shared_weights)
+    finally:
+        shared_weights = gradients = counts = None
+        for memory in (weights_memory, gradients_memory, counts_memory):
+            memory.close()
+            memory.unlink()
+        if dataset is not examples:
+            dataset.unlink()
+
+    return hypothesis_network.HypothesisNetwork(network, engine='matrix', epochs=iteration_max)
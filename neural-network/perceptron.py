@@ -2,11 +2,39 @@
 
 __author__ = "Jordon Dornbos"
 
+import numpy
+
 
 class Perceptron(object):
 
-    def __init__(self, num_inputs):
+    def __init__(self, num_inputs, weights=None, in_sums=None, outputs=None, index=0):
+        # the perceptron is a view over the weight and activation buffers of its layer, which are created if not given
         self.num_inputs = num_inputs
-        self.weights = [0] * (num_inputs + 1)
-        self.in_sum = 0
-        self.output = 0
\ No newline at end of file
+        self._weights = weights if weights is not None else numpy.zeros(num_inputs + 1)
+        self._in_sums = in_sums if in_sums is not None else numpy.zeros(1)
+        self._outputs = outputs if outputs is not None else numpy.zeros(1)
+        self._index = index
+
+    @property
+    def weights(self):
+        return self._weights
+
+    @weights.setter
+    def weights(self, weights):
+        self._weights[:] = weights
+
+    @property
+    def in_sum(self):
+        return self._in_sums[self._index]
+
+    @in_sum.setter
+    def in_sum(self, in_sum):
+        self._in_sums[self._index] = in_sum
+
+    @property
+    def output(self):
+        return self._outputs[self._index]
+
+    @output.setter
+    def output(self, output):
+        self._outputs[self._index] = output
@@ -0,0 +1,335 @@
+"""prediction_server.py: Server scoring flights with a trained hypothesis network.
+
+Usage:
+    python prediction_server.py <checkpoint file> <normalized data file> [port]
+
+Clients send one JSON object per line, such as {"time": "1542", "carrier": "UA", "origin": "DEN", "distance": 1709},
+and get back one JSON object per line, either {"delay": <confidence>} or {"error": <message>}. Concurrent requests are
+coalesced into batches that are scored with a single pass through the network.
+"""
+
+__author__ = "Jordon Dornbos"
+
+import asyncio
+import json
+import logging
+import sys
+import time
+import numpy
+import checkpoint
+import encoding
+import flight_data
+import training
+
+
+class FlightEncoder(object):
+
+    # the names of the fields of a flight, in the order they are encoded
+    FIELDS = ['time', 'carrier', 'origin', 'distance']
+
+    def __init__(self, normalized_data, unknown='drop'):
+        # the normalized data compiled into indexes once, rather than looked up per request
+        self.encoding = encoding.FlightEncoding(normalized_data, unknown)
+
+    def encode(self, departure_time, carrier, origin, distance):
+        """Method to turn the fields of a flight into the inputs of the network, the way flight_data.get_data does.
+
+        Args:
+            departure_time: The departure time as written in the flight data (such as '1542').
+            carrier: The carrier code.
+            origin: The origin airport code.
+            distance: The distance in miles.
+
+        Returns:
+            The normalized departure time, carrier, airport and distance.
+        """
+
+        inputs = self.encoding.encode_one(departure_time, carrier, origin, distance)
+
+        # values missing from the normalized data only have no rate if the fallback is to drop them
+        missing = [field for field, value in zip(self.FIELDS, inputs) if value != value]
+        if missing:
+            raise ValueError('No normalized data for {0}'.format(', '.join(missing)))
+
+        return inputs
+
+
+class PredictionServer(object):
+
+    def __init__(self, hypothesis, normalized_data, max_batch_size=256, max_wait=0.002, unknown='drop'):
+        self.hypothesis = hypothesis
+        self.encoder = FlightEncoder(normalized_data, unknown)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait    # seconds the first request of a batch may wait for more to arrive
+
+        self.queue = None
+        self.batch_task = None
+        self.server = None
+
+        # counters
+        self.num_requests = 0
+        self.num_batches = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.start_time = None
+
+    async def start(self):
+        """Method to start coalescing requests into batches, needed before predict is called."""
+
+        self.queue = asyncio.Queue()
+        self.batch_task = asyncio.ensure_future(self.batch_loop())
+        self.start_time = time.perf_counter()
+
+    async def stop(self):
+        """Method to stop the server and the batching of requests."""
+
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+        if self.batch_task is not None:
+            self.batch_task.cancel()
+            try:
+                await self.batch_task
+            except asyncio.CancelledError:
+                pass
+            self.batch_task = None
+
+        # answer the requests nobody will score any more, rather than leave them waiting forever
+        stopped = RuntimeError('The prediction server stopped')
+        while not self.queue.empty():
+            inputs, future, queued = self.queue.get_nowait()
+            if not future.done():
+                future.set_exception(stopped)
+
+    async def predict(self, departure_time, carrier, origin, distance):
+        """Method to score a flight, batched together with any other flights scored at the same time.
+
+        Args:
+            departure_time: The departure time as written in the flight data (such as '1542').
+            carrier: The carrier code.
+            origin: The origin airport code.
+            distance: The distance in miles.
+
+        Returns:
+            The confidence of the flight being delayed.
+        """
+
+        if self.batch_task is None:
+            raise RuntimeError('The prediction server is not started')
+
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((self.encoder.encode(departure_time, carrier, origin, distance), future,
+                              time.perf_counter()))
+
+        return await future
+
+    async def batch_loop(self):
+        """Loop taking requests off the queue and scoring them in batches."""
+
+        loop = asyncio.get_running_loop()
+        batch = []
+        try:
+            while True:
+                batch = [await self.queue.get()]
+                deadline = loop.time() + self.max_wait
+
+                # take what is already waiting, then wait for more until the batch is full or the deadline passes
+                while len(batch) < self.max_batch_size:
+                    if not self.queue.empty():
+                        batch.append(self.queue.get_nowait())
+                        continue
+
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+
+                self.run_batch(batch)
+        except asyncio.CancelledError:
+            # the batch being gathered when the server stopped is taken off the queue already, answer it here
+            stopped = RuntimeError('The prediction server stopped')
+            for inputs, future, queued in batch:
+                if not future.done():
+                    future.set_exception(stopped)
+            raise
+
+    def run_batch(self, batch):
+        """Method to score a batch of requests and answer them.
+
+        Args:
+            batch: A list of (inputs, future, time queued) requests.
+        """
+
+        try:
+            outputs = self.hypothesis.guess_batch(numpy.array([inputs for inputs, future, queued in batch]))[:, 0]
+        except Exception as error:
+            # fail the requests of this batch, but keep serving
+            logging.exception('Could not score a batch of {0} requests'.format(len(batch)))
+            for inputs, future, queued in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        now = time.perf_counter()
+        for (inputs, future, queued), output in zip(batch, outputs.tolist()):
+            if not future.done():
+                future.set_result(output)
+
+            latency = now - queued
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+
+        self.num_requests += len(batch)
+        self.num_batches += 1
+
+    def stats(self):
+        """Method to return the latency and throughput counters of the server.
+
+        Returns:
+            A map of the counters.
+        """
+
+        elapsed = time.perf_counter() - self.start_time if self.start_time is not None else 0.0
+        return {'requests': self.num_requests,
+                'batches': self.num_batches,
+                'mean_batch_size': float(self.num_requests) / self.num_batches if self.num_batches else 0.0,
+                'mean_latency': self.total_latency / self.num_requests if self.num_requests else 0.0,
+                'max_latency': self.max_latency,
+                'requests_per_second': self.num_requests / elapsed if elapsed > 0 else 0.0}
+
+    async def handle_connection(self, reader, writer):
+        """Method to answer the requests of one client connection, one JSON object per line.
+
+        Args:
+            reader: The stream to read requests from.
+            writer: The stream to write answers to.
+        """
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise TypeError('A request has to be a JSON object, not {0}'.format(type(request).__name__))
+                    if request.get('stats'):
+                        answer = self.stats()
+                    else:
+                        answer = {'delay': await self.predict(request['time'], request['carrier'], request['origin'],
+                                                              request['distance'])}
+                except (ValueError, KeyError, TypeError, RuntimeError) as error:
+                    answer = {'error': str(error)}
+
+                writer.write((json.dumps(answer) + '\n').encode('utf-8'))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=0):
+        """Method to start accepting client connections.
+
+        Args:
+            host: The address to listen on.
+            port: The port to listen on, 0 to pick a free port.
+
+        Returns:
+            The port listened on.
+        """
+
+        if self.batch_task is None:
+            await self.start()
+
+        # a connection answers its requests in order, concurrent clients are batched together
+        self.server = await asyncio.start_server(self.handle_connection, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+
+class PredictionClient(object):
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def connect(self):
+        """Method to open the connection to the server."""
+
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self):
+        """Method to close the connection to the server."""
+
+        self.writer.close()
+        await self.writer.wait_closed()
+
+    async def request(self, message):
+        """Method to send a request and wait for its answer.
+
+        Args:
+            message: The map to send as JSON.
+
+        Returns:
+            The answer map.
+        """
+
+        self.writer.write((json.dumps(message) + '\n').encode('utf-8'))
+        await self.writer.drain()
+        return json.loads(await self.reader.readline())
+
+    async def predict(self, departure_time, carrier, origin, distance):
+        """Method to score a flight on the server.
+
+        Args:
+            departure_time: The departure time as written in the flight data (such as '1542').
+            carrier: The carrier code.
+            origin: The origin airport code.
+            distance: The distance in miles.
+
+        Returns:
+            The confidence of the flight being delayed.
+        """
+
+        answer = await self.request({'time': departure_time, 'carrier': carrier, 'origin': origin,
+                                     'distance': distance})
+        if 'error' in answer:
+            raise ValueError(answer['error'])
+
+        return answer['delay']
+
+
+async def run(checkpoint_filename, normalized_filename, port):
+    """Function to run the server until it is interrupted.
+
+    Args:
+        checkpoint_filename: The checkpoint holding the trained network.
+        normalized_filename: The normalized data used to encode flights.
+        port: The port to listen on.
+    """
+
+    server = PredictionServer(checkpoint.load_hypothesis(checkpoint_filename),
+                              flight_data.get_normalized_data(normalized_filename))
+    port = await server.serve('0.0.0.0', port)
+    logging.info('Prediction server listening on port {0}'.format(port))
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main(argv):
+    port = int(argv[3]) if len(argv) > 3 else 8765
+    asyncio.run(run(argv[1], argv[2], port))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(filename=training.LOG_FILENAME, level=logging.INFO)
+    main(sys.argv)
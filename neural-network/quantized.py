@@ -0,0 +1,269 @@
+"""quantized.py: Frozen reduced precision copies of trained networks for serving.
+
+Usage:
+    python quantized.py <checkpoint file> <output file> <float32|int8> <flight data file> <normalized data file>
+
+The network in the checkpoint is frozen, calibrated on the flight data if quantized to int8, compared against the full
+precision network on the same flight data and saved to the output file.
+"""
+
+__author__ = "Jordon Dornbos"
+
+import logging
+import sys
+import numpy
+import checkpoint
+import feature_cache
+import sampling
+import training
+import vectorized
+
+PRECISIONS = ('float32', 'int8')
+
+# fractions of the largest weight of a node to try as the largest quantized weight when calibrating
+CLIP_RATIOS = (1.0, 0.99, 0.98, 0.95, 0.9, 0.85, 0.8, 0.7)
+
+# the largest value of a quantized weight
+INT8_MAX = 127
+
+# the number of examples the command line calibrates int8 scales with
+CALIBRATION_ROWS = 10000
+
+
+def quantize(weights, ratios):
+    """Function to quantize the weights of every node to 8 bit integers with a scale per node.
+
+    Args:
+        weights: A matrix with the weights of one node per row, without the bias weight.
+        ratios: The fraction of the largest weight of every node to map to INT8_MAX, weights beyond it are clipped.
+
+    Returns:
+        The quantized weights and the scale of every node, such that the weights are about quantized * scale.
+    """
+
+    scales = numpy.abs(weights).max(axis=1) * ratios / INT8_MAX
+    scales[scales == 0.0] = 1.0     # nodes without weights keep zeros
+    quantized = numpy.clip(numpy.round(weights / scales[:, None]), -INT8_MAX, INT8_MAX).astype(numpy.int8)
+
+    return quantized, scales
+
+
+def calibrate(weights, inputs):
+    """Function to quantize the weights of a layer with the scales that best reproduce its sums on sample inputs.
+
+    Clipping the largest weights gives the rest of the weights more precision, how much clipping pays off depends on
+    the inputs, so every clip ratio is tried on every node.
+
+    Args:
+        weights: A matrix with the weights of one node per row, without the bias weight.
+        inputs: A matrix of sample inputs to the layer, None to not clip any weights.
+
+    Returns:
+        The quantized weights and the scale of every node.
+    """
+
+    if inputs is None or not len(inputs):
+        return quantize(weights, 1.0)
+
+    reference = numpy.dot(inputs, weights.T)
+    best_error = numpy.full(len(weights), numpy.inf)
+    best_quantized, best_scales = quantize(weights, 1.0)
+    for ratio in CLIP_RATIOS:
+        quantized, scales = quantize(weights, ratio)
+        error = numpy.mean((numpy.dot(inputs, quantized.T) * scales - reference) ** 2, axis=0)
+
+        better = error < best_error
+        best_error[better] = error[better]
+        best_quantized[better] = quantized[better]
+        best_scales[better] = scales[better]
+
+    return best_quantized, best_scales
+
+
+class QuantizedNetwork(object):
+
+    def __init__(self, precision, weights, scales, biases):
+        self.precision = precision  # either 'float32' or 'int8'
+        self.weights = weights      # the weights of every layer, one column per node (float32 or int8)
+        self.scales = scales        # the scale of every node of every layer for int8 weights, otherwise None
+        self.biases = biases        # the bias weights of every layer as float32
+
+    def guess_batch(self, inputs):
+        """Guess method for many inputs at once, computed in single precision.
+
+        Args:
+            inputs: A matrix with one input per row (or a single input vector).
+
+        Returns:
+            A matrix with the confidence of every input being in the function, one row per input.
+        """
+
+        output = numpy.asarray(inputs, numpy.float32)
+        for l in range(len(self.weights)):
+            if self.scales is None:
+                sums = numpy.dot(output, self.weights[l])
+            else:
+                # scaling the sums rather than the weights keeps the weights 8 bit in memory
+                sums = numpy.dot(output, self.weights[l].astype(numpy.float32))
+                sums *= self.scales[l]
+            sums += self.biases[l]
+            output = vectorized.sigmoid_float32(sums)
+
+        return output
+
+    def predict(self, inputs, threshold=0.5):
+        """Method to decide for many inputs at once whether they are in the function.
+
+        Args:
+            inputs: A matrix with one input per row.
+            threshold: The confidence above which an input counts as being in the function.
+
+        Returns:
+            A matrix of 1.0 for inputs in the function and 0.0 otherwise, one row per input.
+        """
+
+        return (self.guess_batch(inputs) > threshold).astype(numpy.float64)
+
+    def num_bytes(self):
+        """Method to count the bytes taken by the weights, scales and biases.
+
+        Returns:
+            The number of bytes.
+        """
+
+        arrays = self.weights + self.biases + (self.scales if self.scales is not None else [])
+        return sum(array.nbytes for array in arrays)
+
+
+def freeze(network, precision='float32', calibration_inputs=None):
+    """Function to make a reduced precision copy of a trained network for guessing.
+
+    Args:
+        network: A multilayer network with L layers, weights W(j,i), activation function g.
+        precision: Either 'float32' to round the weights to single precision or 'int8' to quantize them.
+        calibration_inputs: A matrix of sample inputs to pick the int8 scales with, None to scale by the largest weight.
+
+    Returns:
+        A quantized network.
+    """
+
+    if precision not in PRECISIONS:
+        raise ValueError('Unknown precision {0}, expected one of {1}'.format(precision, PRECISIONS))
+
+    weights = []
+    scales = [] if precision == 'int8' else None
+    biases = []
+    inputs = numpy.asarray(calibration_inputs, numpy.float32) if calibration_inputs is not None else None
+    for matrix in vectorized.layer_matrices(network):
+        biases.append(matrix[:, -1].astype(numpy.float32))
+        if precision == 'float32':
+            weights.append(numpy.ascontiguousarray(matrix[:, :-1].T, dtype=numpy.float32))
+            continue
+
+        quantized, layer_scales = calibrate(matrix[:, :-1], inputs)
+        weights.append(numpy.ascontiguousarray(quantized.T))
+        scales.append(layer_scales.astype(numpy.float32))
+
+        # calibrate the next layer on the outputs this layer will really give
+        if inputs is not None:
+            inputs = vectorized.sigmoid_float32(numpy.dot(inputs, weights[-1].astype(numpy.float32)) * scales[-1] +
+                                                biases[-1])
+
+    return QuantizedNetwork(precision, weights, scales, biases)
+
+
+def accuracy_report(hypothesis, frozen, verification_data):
+    """Function to measure how much accuracy a frozen network lost against the full precision network.
+
+    Args:
+        hypothesis: The full precision hypothesis network.
+        frozen: The quantized network made from it.
+        verification_data: The examples to compare the networks on.
+
+    Returns:
+        A map of the accuracy of both networks, the accuracy lost, the largest and mean difference between their
+        outputs, the fraction of examples they decide the same way and the bytes taken by their weights.
+    """
+
+    accuracy = training.test(hypothesis, verification_data)
+    frozen_accuracy = training.test(frozen, verification_data)
+
+    max_error = 0.0
+    total_error = 0.0
+    agreed = 0
+    count = 0
+    for x, y in vectorized.as_blocks(verification_data).blocks():
+        outputs = hypothesis.guess_batch(x)
+        frozen_outputs = frozen.guess_batch(x)
+        errors = numpy.abs(outputs - frozen_outputs)
+        max_error = max(max_error, float(errors.max()) if errors.size else 0.0)
+        total_error += float(errors.sum())
+        agreed += int(numpy.count_nonzero((outputs > 0.5) == (frozen_outputs > 0.5)))
+        count += errors.size
+
+    return {'precision': frozen.precision,
+            'accuracy': accuracy,
+            'frozen_accuracy': frozen_accuracy,
+            'accuracy_delta': frozen_accuracy - accuracy,
+            'max_output_error': max_error,
+            'mean_output_error': total_error / count if count else 0.0,
+            'agreement': float(agreed) / count if count else 1.0,
+            'bytes': hypothesis.network.weights.nbytes,
+            'frozen_bytes': frozen.num_bytes()}
+
+
+def save(filename, frozen):
+    """Function to write a quantized network to a file.
+
+    Args:
+        filename: The file to write, numpy adds .npz if it has no extension.
+        frozen: The quantized network.
+    """
+
+    arrays = {'precision': numpy.array(frozen.precision)}
+    for l in range(len(frozen.weights)):
+        arrays['weights{0}'.format(l)] = frozen.weights[l]
+        arrays['biases{0}'.format(l)] = frozen.biases[l]
+        if frozen.scales is not None:
+            arrays['scales{0}'.format(l)] = frozen.scales[l]
+
+    numpy.savez(filename, **arrays)
+
+
+def load(filename):
+    """Function to read a quantized network written by save.
+
+    Args:
+        filename: The file to read.
+
+    Returns:
+        The quantized network.
+    """
+
+    with numpy.load(filename) as arrays:
+        precision = str(arrays['precision'])
+        num_layers = len([name for name in arrays.files if name.startswith('weights')])
+        weights = [arrays['weights{0}'.format(l)] for l in range(num_layers)]
+        biases = [arrays['biases{0}'.format(l)] for l in range(num_layers)]
+        scales = [arrays['scales{0}'.format(l)] for l in range(num_layers)] if precision == 'int8' else None
+
+    return QuantizedNetwork(precision, weights, scales, biases)
+
+
+def main(argv):
+    hypothesis = checkpoint.load_hypothesis(argv[1])
+    data = feature_cache.load(argv[4], argv[5])
+    verification_data = sampling.SampledBlocks(data.x, data.y, sampling.Sampler(data.y, shuffle=False))
+
+    frozen = freeze(hypothesis.network, argv[3], data.x[:CALIBRATION_ROWS])
+    report = accuracy_report(hypothesis, frozen, verification_data)
+    for name in sorted(report):
+        logging.info('{0}: {1}'.format(name, report[name]))
+
+    save(argv[2], frozen)
+    logging.info('Frozen network saved to {0}'.format(argv[2]))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(filename=training.LOG_FILENAME, level=logging.INFO)
+    main(sys.argv)
@@ -0,0 +1,113 @@
+"""sampling.py: Class balancing and shuffling of examples through index arrays."""
+
+__author__ = "Jordon Dornbos"
+
+import random
+import numpy
+
+# ways of balancing delayed and on time examples
+BALANCES = (None, 'interleave', 'undersample', 'oversample')
+
+
+def interleave(first, second):
+    """Function to alternate two arrays of indices, as far as the shorter one goes.
+
+    Args:
+        first: The indices to put at the even positions.
+        second: The indices to put at the odd positions.
+
+    Returns:
+        An array holding first[0], second[0], first[1], second[1] and so on.
+    """
+
+    count = min(len(first), len(second))
+    indices = numpy.empty(2 * count, dtype=numpy.intp)
+    indices[0::2] = first[:count]
+    indices[1::2] = second[:count]
+
+    return indices
+
+
+class Sampler(object):
+
+    def __init__(self, y, balance='interleave', shuffle=True, seed=None, rows=None):
+        if balance not in BALANCES:
+            raise ValueError('Unknown balance {0}, expected one of {1}'.format(balance, BALANCES))
+
+        self.balance = balance
+        self.shuffle = shuffle  # whether every call to indices draws a new order
+
+        # the rows of every class are found once, every order after that only moves indices around
+        delayed = numpy.asarray(y)[:, 0] == 1.0
+        if rows is None:
+            self.rows = numpy.arange(len(delayed))
+            self.positive = numpy.flatnonzero(delayed)
+            self.negative = numpy.flatnonzero(~delayed)
+        else:
+            # only draw from the rows given, such as the training rows of a cross validation fold
+            self.rows = numpy.asarray(rows)
+            self.positive = self.rows[delayed[self.rows]]
+            self.negative = self.rows[~delayed[self.rows]]
+
+        # seeded from the random module unless given, so random.seed makes the orders repeatable
+        self.random = numpy.random.default_rng(seed if seed is not None else random.getrandbits(32))
+
+    def indices(self):
+        """Method to draw the order to visit the examples in.
+
+        With 'interleave' delayed and on time examples alternate and the surplus of the larger class is left out (a
+        different random surplus every time when shuffling). 'undersample' leaves out the same surplus and
+        'oversample' instead repeats random examples of the smaller class until it is as large as the larger class,
+        but both visit the examples in any order rather than alternating.
+
+        Returns:
+            An array of row indices.
+        """
+
+        if self.balance is None:
+            return self.random.permutation(self.rows) if self.shuffle else self.rows
+
+        positive, negative = self.positive, self.negative
+        if self.shuffle:
+            positive = self.random.permutation(positive)
+            negative = self.random.permutation(negative)
+
+        if self.balance == 'oversample' and len(positive) and len(negative):
+            # keep every example of the smaller class, then draw the rest with replacement
+            smaller, larger = sorted((positive, negative), key=len)
+            extra = self.random.integers(0, len(smaller), len(larger) - len(smaller))
+            grown = numpy.concatenate((smaller, smaller[extra]))
+            if smaller is positive:
+                positive = grown
+            else:
+                negative = grown
+
+        indices = interleave(positive, negative)
+        if self.shuffle and self.balance != 'interleave':
+            self.random.shuffle(indices)
+
+        return indices
+
+
+class SampledBlocks(object):
+
+    def __init__(self, x, y, sampler, block_size=65536):
+        self.x = x
+        self.y = y
+        self.sampler = sampler
+        self.block_size = block_size    # rows gathered at a time, None to gather every row at once
+
+    def blocks(self):
+        """Method to return the examples in the order drawn by the sampler, a new order every call.
+
+        Only the rows of one block are copied at a time.
+
+        Returns:
+            A generator of (inputs, outputs) matrices.
+        """
+
+        indices = self.sampler.indices()
+        block_size = self.block_size if self.block_size is not None else max(len(indices), 1)
+        for start in range(0, len(indices), block_size):
+            block = indices[start:start + block_size]
+            yield self.x[block], self.y[block]
@@ -0,0 +1,110 @@
+"""sweep.py: Parallel search for the best network parameters."""
+
+__author__ = "Jordon Dornbos"
+
+import logging
+import multiprocessing
+import random
+import training
+
+# data loaded once in every worker process
+_training_data = None
+_verification_data = None
+
+
+def parameter_grid(layers=range(1, 4), nodes=range(3, 11), alphas=(0.3,)):
+    """Function to build every combination of network parameters to try.
+
+    Args:
+        layers: The numbers of hidden layers to try.
+        nodes: The numbers of nodes per hidden layer to try.
+        alphas: The learning rates to try.
+
+    Returns:
+        A list of (layers, nodes, alpha) tuples.
+    """
+
+    return [(l, n, a) for l in layers for n in nodes for a in alphas]
+
+
+def init_worker(training_data, verification_data):
+    """Function to give a worker process the data it will train and test with.
+
+    Args:
+        training_data: The examples to train every network with.
+        verification_data: The examples to test every network with.
+    """
+
+    global _training_data, _verification_data
+    _training_data = training_data
+    _verification_data = verification_data
+
+
+def run_configuration(job):
+    """Function to train and test a network with one set of parameters.
+
+    Args:
+        job: A tuple of the parameters (layers, nodes, alpha), the maximum amount of iterations, the batch size, the
+            random seed (None to leave the generator alone) and the names of the optimizer and schedule.
+
+    Returns:
+        The parameters, the accuracy on the verification data and the weights learned.
+    """
+
+    (layers, nodes, alpha), iteration_max, batch_size, seed, optimizer, schedule = job
+    if seed is not None:
+        random.seed(seed)
+
+    logging.info('Testing with {0} layer(s), {1} nodes per layer and alpha {2}'.format(layers, nodes, alpha))
+    network = training.train(_training_data, alpha, iteration_max, layers, nodes, batch_size=batch_size,
+                             optimizer=optimizer, schedule=schedule)
+    accuracy = training.test(network, _verification_data)
+
+    return (layers, nodes, alpha), accuracy, network.network.copy_weights()
+
+
+def run_sweep(training_data, verification_data, grid, iteration_max=10000, batch_size=1, processes=None, seed=None,
+              optimizer=None, schedule=None):
+    """Function to train and test a network for every set of parameters in a process pool.
+
+    Args:
+        training_data: The examples to train every network with.
+        verification_data: The examples to test every network with.
+        grid: A list of (layers, nodes, alpha) tuples to try.
+        iteration_max: The maximum amount of iterations to train every network for.
+        batch_size: The number of examples to learn from per weight update, None to use every example at once.
+        processes: The number of worker processes, defaults to the number of cores.
+        seed: The random seed of the first set of parameters (the rest count up from it), None to not seed.
+        optimizer: The name of the optimizer to train with (see optimizers.OPTIMIZERS), None for plain updates.
+        schedule: The name of the learning rate schedule (see optimizers.SCHEDULES), None to drop it linearly.
+
+    Returns:
+        The best parameters, their accuracy and the weights learned with them.
+    """
+
+    jobs = []
+    for i, parameters in enumerate(grid):
+        jobs.append((parameters, iteration_max, batch_size, None if seed is None else seed + i, optimizer, schedule))
+
+    best_parameters = None
+    best_accuracy = -1.0
+    best_weights = None
+
+    pool = multiprocessing.Pool(processes, init_worker, (training_data, verification_data))
+    try:
+        # collect the results in the order they finish
+        for parameters, accuracy, weights in pool.imap_unordered(run_configuration, jobs):
+            logging.info('Accuracy with {0} layer(s), {1} nodes per layer and alpha {2} was: {3:.4f}'.format(
+                parameters[0], parameters[1], parameters[2], accuracy))
+
+            # remember the best parameters
+            if accuracy > best_accuracy:
+                best_parameters = parameters
+                best_accuracy = accuracy
+                best_weights = weights
+    finally:
+        pool.close()
+        pool.join()
+
+    return best_parameters, best_accuracy, best_weights
+
@@ -0,0 +1,53 @@
+"""telemetry.py: Sinks for the training hooks of back_prop_learning."""
+
+__author__ = "Jordon Dornbos"
+
+import csv
+import json
+
+# the values reported for every sampled iteration
+FIELDS = ['iteration', 'alpha', 'seconds', 'forward', 'delta', 'update', 'error']
+
+
+class JsonLinesSink(object):
+
+    def __init__(self, filename):
+        self.file = open(filename, 'w')
+
+    def __call__(self, record):
+        """Method to write the record of an iteration as one line of JSON.
+
+        Args:
+            record: A map of the values reported for the iteration.
+        """
+
+        self.file.write(json.dumps(record) + '\n')
+        self.file.flush()
+
+    def close(self):
+        """Method to close the file written to."""
+
+        self.file.close()
+
+
+class CsvSink(object):
+
+    def __init__(self, filename):
+        self.file = open(filename, 'w')
+        self.writer = csv.DictWriter(self.file, FIELDS, extrasaction='ignore')
+        self.writer.writeheader()
+
+    def __call__(self, record):
+        """Method to write the record of an iteration as one row of CSV.
+
+        Args:
+            record: A map of the values reported for the iteration.
+        """
+
+        self.writer.writerow(record)
+        self.file.flush()
+
+    def close(self):
+        """Method to close the file written to."""
+
+        self.file.close()
@@ -0,0 +1,146 @@
+"""training.py: Training and testing of networks on flight data, shared by the scripts."""
+
+__author__ = "Jordon Dornbos"
+
+import logging
+import back_prop_learning
+import feature_cache
+import metrics
+import multilayer_network
+import optimizers
+import parallel_training
+import sampling
+
+# the file the scripts log to
+LOG_FILENAME = 'neural-network.log'
+
+# the flight data subsets and normalized data the scripts train and test on by default
+TRAINING_FILENAME = '../data/flight/2004_subset.csv'
+TRAINING_NORMALIZED_FILENAME = '../data/normalized/2004_output.txt'
+VERIFICATION_FILENAME = '../data/flight/2007_subset.csv'
+VERIFICATION_NORMALIZED_FILENAME = '../data/normalized/2007_output.txt'
+
+
+def train(examples, alpha, iteration_max, num_hidden_layers, num_nodes_per_hidden_layer, weights=None, verbose=False,
+          engine='matrix', batch_size=None, activation='sigmoid', processes=None, parallel_mode='sync', optimizer=None,
+          schedule=None):
+    """Function to create a network sized by the examples and train it.
+
+    Args:
+        examples: A set of examples, each with input vector x and output vector y, or a source of blocks of examples.
+        alpha: The learning rate.
+        iteration_max: The maximum amount of iterations to perform.
+        num_hidden_layers: The number of hidden layers.
+        num_nodes_per_hidden_layer: The number of nodes per hidden layer.
+        weights: Starting weights to load into the network, None for random weights.
+        verbose: Whether or not to log data values as the network learns.
+        engine: Either 'node' or 'matrix', see back_prop_learning.
+        batch_size: The number of examples to learn from per weight update, None for one in this process or
+            parallel_training.BATCH_SIZE per worker across processes.
+        activation: The name of the activation function, see vectorized.ACTIVATIONS.
+        processes: The number of worker processes to train with (see parallel_training.py), None to train in this
+            process.
+        parallel_mode: Either 'sync' or 'hogwild', see parallel_training.train_parallel.
+        optimizer: The name of the optimizer to train with (see optimizers.OPTIMIZERS), None for plain updates.
+        schedule: The name of the learning rate schedule (see optimizers.SCHEDULES), None to drop it linearly.
+
+    Returns:
+        The hypothesis network.
+    """
+
+    # create the network, sized by the first example
+    logging.info('Creating neural network...')
+    if hasattr(examples, 'blocks'):
+        x, y = next(iter(examples.blocks()))
+        num_inputs, num_outputs = x.shape[1], y.shape[1]
+    else:
+        num_inputs, num_outputs = len(examples[0].x), len(examples[0].y)
+    network = multilayer_network.MultilayerNetwork(num_inputs, num_hidden_layers, num_nodes_per_hidden_layer,
+                                                   num_outputs, activation)
+
+    # the optimizer and schedule are given by name, see optimizers.OPTIMIZERS and optimizers.SCHEDULES
+    optimizer = optimizers.OPTIMIZERS[optimizer]() if optimizer is not None else None
+    schedule = optimizers.SCHEDULES[schedule]() if schedule is not None else None
+
+    # do learning
+    logging.info('Training neural network...')
+    if processes is not None:
+        # the workers wait for each other after every batch in the sync mode, so single examples would mostly wait
+        if batch_size is None:
+            batch_size = parallel_training.BATCH_SIZE
+
+        # split the examples across worker processes
+        hypothesis_network = parallel_training.train_parallel(examples, network, alpha=alpha,
+                                                              iteration_max=iteration_max, weights=weights,
+                                                              processes=processes, mode=parallel_mode,
+                                                              batch_size=batch_size, optimizer=optimizer,
+                                                              schedule=schedule, verbose=verbose)
+    else:
+        if batch_size is None:
+            batch_size = 1
+
+        hypothesis_network = back_prop_learning.back_prop_learning(
+            examples, network, alpha=alpha, iteration_max=iteration_max, weights=weights, verbose=verbose,
+            engine=engine, batch_size=batch_size, optimizer=optimizer, schedule=schedule)
+
+    # print out the weights learned
+    logging.info('Weights learned: {0}'.format(hypothesis_network.network.weight_string()))
+
+    return hypothesis_network
+
+
+def test(network, verification_data, verbose=False):
+    """Function to measure and log how well a network guesses the verification data.
+
+    Args:
+        network: The hypothesis network, or any network with guess_batch.
+        verification_data: A set of examples, each with input vector x and output vector y, or a source of blocks of
+            examples.
+        verbose: Whether to log every guess.
+
+    Returns:
+        The fraction of examples guessed right.
+    """
+
+    logging.info('Testing accuracy...')
+
+    # one pass over the verification data gives every metric, including the accuracy at every threshold
+    results = metrics.evaluate(network, verification_data, verbose=verbose)
+
+    logging.info('Number of correct delayed flight predictions was: ' + str(results.true_positives))
+    logging.info('Number of incorrrect delay flight predictions was: ' + str(results.false_negatives))
+    logging.info('Number of correct on time flight predictions was: ' + str(results.true_negatives))
+    logging.info('Number of incorrect on time flight predictions was: ' + str(results.false_positives))
+
+    average_error = float(results.false_negatives + results.false_positives) / results.count()
+    average_accuracy = 1.0 - average_error
+    logging.info('Average accuracy was: {0:.3f}'.format(average_accuracy))
+    logging.info('Average error was: {0:.3f}'.format(average_error))
+
+    best_threshold, best_accuracy = results.best_threshold()
+    logging.info('Precision: {0:.3f} Recall: {1:.3f} Log loss: {2:.4f} AUC: {3:.4f}'.format(
+        results.precision(), results.recall(), results.log_loss(), results.auc()))
+    logging.info('Best threshold was {0:.3f} with accuracy {1:.3f}'.format(best_threshold, best_accuracy))
+
+    return average_accuracy
+
+
+def load_data():
+    """Function to load the training and verification data, from the feature cache if the files were loaded before.
+
+    Returns:
+        A source of blocks of training examples, alternating delayed and on time flights in a new order every
+        iteration, and a source of blocks of verification examples.
+    """
+
+    # get training and verification data
+    logging.info('Loading data...')
+    training = feature_cache.load(TRAINING_FILENAME, TRAINING_NORMALIZED_FILENAME)
+    verification = feature_cache.load(VERIFICATION_FILENAME, VERIFICATION_NORMALIZED_FILENAME)
+
+    # alternate delayed and on time flights to avoid a bias, in a new order every training iteration
+    training_data = sampling.SampledBlocks(training.x, training.y, sampling.Sampler(training.y))
+    verification_data = sampling.SampledBlocks(verification.x, verification.y,
+                                               sampling.Sampler(verification.y, shuffle=False))
+
+    return training_data, verification_data
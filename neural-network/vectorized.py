@@ -0,0 +1,335 @@
+"""vectorized.py: Matrix implementation of the multilayer network computations."""
+
+__author__ = "Jordon Dornbos"
+
+import time
+import numpy
+
+# the most examples kept by RecordedBlocks, enough for a steady error without keeping a copy of a large data set
+RECORDED_ROWS = 1 << 17
+
+
+def layer_matrices(network):
+    """Function to return the weights of every layer as a matrix.
+
+    Row n of the matrix for layer l holds the weights of node n in that layer, with the bias weight in the last column
+    (the same order the weights are kept in a perceptron). The matrices are views of the network's weight buffer, so
+    updating them updates the network.
+
+    Args:
+        network: A multilayer network with L layers, weights W(j,i), activation function g.
+
+    Returns:
+        A list of weight matrices where index l - 1 holds the weights of layer l.
+    """
+
+    return [network.layer_weights(l) for l in range(1, network.num_layers())]
+
+
+def example_arrays(examples):
+    """Function to put the input and output vectors of a set of examples into matrices.
+
+    Args:
+        examples: A set of examples, each with input vector x and output vector y.
+
+    Returns:
+        A matrix with one input vector per row and a matrix with one output vector per row.
+    """
+
+    x = numpy.array([example.x for example in examples], dtype=numpy.float64)
+    y = numpy.array([example.y for example in examples], dtype=numpy.float64)
+
+    return x, y
+
+
+class ArrayBlocks(object):
+
+    def __init__(self, x, y, block_size=None):
+        self.x = x
+        self.y = y
+        self.block_size = block_size    # None to return every example as a single block
+
+    def blocks(self):
+        """Method to return the inputs and outputs as blocks of rows.
+
+        Returns:
+            A list of (inputs, outputs) matrices, which are views of the full matrices.
+        """
+
+        if self.block_size is None:
+            return [(self.x, self.y)]
+
+        return [(self.x[i:i + self.block_size], self.y[i:i + self.block_size])
+                for i in range(0, len(self.x), self.block_size)]
+
+
+class RecordedBlocks(object):
+
+    def __init__(self, row_limit=RECORDED_ROWS):
+        self.row_limit = row_limit
+        self.recorded = []  # the (inputs, outputs) matrices kept
+        self.rows = 0
+
+    def record(self, x, y):
+        """Method to keep a copy of a block of examples, until row_limit examples are kept.
+
+        Args:
+            x: A matrix with one input vector per row.
+            y: A matrix with one output vector per row.
+        """
+
+        take = min(len(x), self.row_limit - self.rows)
+        if take > 0:
+            self.recorded.append((numpy.array(x[:take]), numpy.array(y[:take])))
+            self.rows += take
+
+    def blocks(self):
+        """Method to return the examples kept, in the order they were recorded.
+
+        A source of examples can return them in a new order every time (see sampling.SampledBlocks) or read them from
+        a file again (see flight_data.FlightData), the recorded blocks are the same every time and cost nothing to
+        return.
+
+        Returns:
+            A list of (inputs, outputs) matrices.
+        """
+
+        return self.recorded
+
+
+def as_blocks(examples):
+    """Function to turn examples into a source of blocks of inputs and outputs.
+
+    Args:
+        examples: Either a set of examples, each with input vector x and output vector y, or an object that already
+            has a blocks method (such as flight_data.FlightData).
+
+    Returns:
+        An object whose blocks method returns the examples as (inputs, outputs) matrices.
+    """
+
+    if hasattr(examples, 'blocks'):
+        return examples
+
+    return ArrayBlocks(*example_arrays(examples))
+
+
+def sigmoid(x):
+    """Sigmoid function applied to every element of an array.
+
+    Args:
+        x: The values to use in the sigmoid computation.
+
+    Returns:
+        The sigmoid values for x.
+    """
+
+    # work in a single new array rather than allocating one per operation
+    output = numpy.negative(x)
+    numpy.exp(output, out=output)
+    output += 1.0
+    return numpy.reciprocal(output, out=output)
+
+
+def sigmoid_float32(x):
+    """Sigmoid function applied to every element of an array, computed in single precision.
+
+    The outputs are within 1e-7 of sigmoid, for about 1.7 times the speed on large blocks (see
+    activation_benchmark.py).
+
+    Args:
+        x: The values to use in the sigmoid computation.
+
+    Returns:
+        The sigmoid values for x, as single precision floats.
+    """
+
+    output = numpy.negative(x, dtype=numpy.float32)
+    numpy.exp(output, out=output)
+    output += 1.0
+    return numpy.reciprocal(output, out=output)
+
+
+# activation functions a network can select by name
+ACTIVATIONS = {'sigmoid': sigmoid, 'float32': sigmoid_float32}
+
+
+def feed_forward(matrices, input, activation=sigmoid):
+    """Function to feed an input forward through the weight matrices.
+
+    Args:
+        matrices: A list of weight matrices where index l - 1 holds the weights of layer l.
+        input: The values to input into the network, either a single vector or a matrix with one input per row.
+        activation: The activation function of the nodes.
+
+    Returns:
+        A list with the outputs of every layer, starting with the input layer.
+    """
+
+    outputs = [input]
+    for matrix in matrices:
+        outputs.append(activation(numpy.dot(outputs[-1], matrix[:, :-1].T) + matrix[:, -1]))
+
+    return outputs
+
+
+def mean_squared_error(matrices, x, y, activation=sigmoid):
+    """Function to compute the error of the network over a set of examples.
+
+    Args:
+        matrices: A list of weight matrices where index l - 1 holds the weights of layer l.
+        x: A matrix with one input vector per row.
+        y: A matrix with one output vector per row.
+        activation: The activation function of the nodes.
+
+    Returns:
+        The mean of the squared differences between the outputs of the network and y.
+    """
+
+    return float(numpy.mean((y - feed_forward(matrices, x, activation)[-1]) ** 2))
+
+
+def block_error(matrices, examples, activation=sigmoid):
+    """Function to compute the error of the network over every block of a source of examples.
+
+    Args:
+        matrices: A list of weight matrices where index l - 1 holds the weights of layer l.
+        examples: An object whose blocks method returns (inputs, outputs) matrices.
+        activation: The activation function of the nodes.
+
+    Returns:
+        The mean of the squared differences between the outputs of the network and the expected outputs.
+    """
+
+    total = 0.0
+    count = 0
+    for x, y in examples.blocks():
+        total += mean_squared_error(matrices, x, y, activation) * y.size
+        count += y.size
+
+    return total / count
+
+
+def delta_propagation(matrices, outputs, output_delta):
+    """Function for backpropagation of the delta values.
+
+    Args:
+        matrices: A list of weight matrices where index l - 1 holds the weights of layer l.
+        outputs: A list with the outputs of every layer, starting with the input layer.
+        output_delta: The delta values at the output layer.
+
+    Returns:
+        A list of deltas where index l - 1 holds the deltas of layer l.
+    """
+
+    deltas = [output_delta]
+    for l in range(len(matrices) - 1, 0, -1):
+        # "blame" a node as much as its weight
+        summation = numpy.dot(deltas[0], matrices[l][:, :-1])
+        deltas.insert(0, outputs[l] * (1.0 - outputs[l]) * summation)
+
+    return deltas
+
+
+def update_weights(matrices, outputs, deltas, alpha):
+    """Function to update the weight matrices using the delta values of a batch of examples.
+
+    The changes are averaged over the batch, so a batch of one example makes the same update as the node engine.
+
+    Args:
+        matrices: A list of weight matrices where index l - 1 holds the weights of layer l.
+        outputs: A list with the outputs of every layer (one row per example), starting with the input layer.
+        deltas: A list of deltas (one row per example) where index l - 1 holds the deltas of layer l.
+        alpha: The learning rate.
+    """
+
+    rate = alpha / len(outputs[0])
+    for l in range(len(matrices)):
+        matrices[l][:, :-1] += rate * numpy.dot(deltas[l].T, outputs[l])
+        matrices[l][:, -1] += rate * deltas[l].sum(axis=0)    # bias input
+
+
+def weight_gradients(outputs, deltas, gradients):
+    """Function to compute the summed weight changes of a batch of examples, without applying them.
+
+    Args:
+        outputs: A list with the outputs of every layer (one row per example), starting with the input layer.
+        deltas: A list of deltas (one row per example) where index l - 1 holds the deltas of layer l.
+        gradients: A list of matrices shaped like the weight matrices to write the changes to.
+    """
+
+    for l in range(len(gradients)):
+        gradients[l][:, :-1] = numpy.dot(deltas[l].T, outputs[l])
+        gradients[l][:, -1] = deltas[l].sum(axis=0)   # bias input
+
+
+def learn_loop(matrices, x, y, alpha, batch_size=1, activation=sigmoid, timings=None, optimizer=None):
+    """A loop representing the learning process, one batch of examples at a time.
+
+    Args:
+        matrices: A list of weight matrices where index l - 1 holds the weights of layer l.
+        x: A matrix with one input vector per row.
+        y: A matrix with one output vector per row.
+        alpha: The learning rate.
+        batch_size: The number of examples to learn from per weight update, None to use every example at once.
+        activation: The activation function of the nodes.
+        timings: A map to add the seconds spent in the 'forward', 'delta' and 'update' phases to, None to not time them.
+        optimizer: The optimizer to update the weights with (see optimizers.py), None to add alpha times the changes.
+    """
+
+    if not len(x):
+        return
+
+    if batch_size is None:
+        batch_size = max(len(x), 1)
+
+    if optimizer is not None:
+        gradients = [numpy.empty_like(matrix) for matrix in matrices]
+
+    for start in range(0, len(x), batch_size):
+        if timings is not None:
+            phase_start = time.perf_counter()
+
+        outputs = feed_forward(matrices, x[start:start + batch_size], activation)
+
+        # compute the error at the output, the derivative of the sigmoid comes from the outputs already computed
+        output_delta = outputs[-1] * (1.0 - outputs[-1]) * (y[start:start + batch_size] - outputs[-1])
+
+        if timings is not None:
+            phase_start = add_timing(timings, 'forward', phase_start)
+
+        # propagate the deltas backward from output layer to input layer
+        deltas = delta_propagation(matrices, outputs, output_delta)
+
+        if timings is not None:
+            phase_start = add_timing(timings, 'delta', phase_start)
+
+        # update every weight in the network using deltas
+        if optimizer is not None:
+            weight_gradients(outputs, deltas, gradients)
+            for gradient in gradients:
+                gradient /= len(outputs[0])
+            optimizer.step(matrices, gradients, alpha)
+        else:
+            update_weights(matrices, outputs, deltas, alpha)
+
+        if timings is not None:
+            add_timing(timings, 'update', phase_start)
+
+
+def add_timing(timings, phase, phase_start):
+    """Function to add the time since the start of a phase to its total.
+
+    Args:
+        timings: A map from phase name to seconds spent in it.
+        phase: The phase that just finished.
+        phase_start: The time.perf_counter value at the start of the phase.
+
+    Returns:
+        The current time.perf_counter value, to use as the start of the next phase.
+    """
+
+    now = time.perf_counter()
+    timings[phase] = timings.get(phase, 0.0) + now - phase_start
+
+    return now